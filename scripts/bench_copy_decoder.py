@@ -0,0 +1,59 @@
+import timeit
+from pathlib import Path
+
+from dump_index import iter_table_events
+from dump_parser import decode_row, resolve_dump_path
+
+root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
+dump_path = resolve_dump_path(root / 'db' / 'lovetofly-portal-full-dump.sql')
+
+TABLE = 'public.users'
+TARGET_MB = 32
+REPEAT = 5
+
+
+def legacy_unescape_pg(value: str) -> str:
+    # The seven-pass decoder the report scripts used before dump_parser.
+    return (
+        value.replace('\\\\', '\\')
+        .replace('\\t', '\t')
+        .replace('\\n', '\n')
+        .replace('\\r', '\r')
+        .replace('\\b', '\b')
+        .replace('\\f', '\f')
+        .replace('\\v', '\v')
+    )
+
+
+def legacy_decode_row(row: str):
+    return [None if v == '\\N' else legacy_unescape_pg(v) for v in row.split('\t')]
+
+
+def main():
+    if not dump_path.exists():
+        raise SystemExit(f'Dump not found: {dump_path}')
+
+    section = [payload for kind, _, payload in iter_table_events(dump_path, [TABLE], decode=False) if kind == 'row']
+    if not section:
+        raise SystemExit(f'No rows for {TABLE} in {dump_path}')
+
+    section_mb = sum(len(r) + 1 for r in section) / (1024 * 1024)
+    rows = section * max(1, round(TARGET_MB / section_mb))
+    size_mb = section_mb * (len(rows) // len(section))
+    with_backslash = sum(1 for r in section if '\\' in r)
+
+    print(f'{TABLE}: {len(section)} distinct rows ({with_backslash} with escapes), '
+          f'replicated to {len(rows)} rows / {size_mb:.1f} MB')
+
+    results = {}
+    for name, fn in (('legacy (7x str.replace)', legacy_decode_row), ('single-pass decode_row', decode_row)):
+        best = min(timeit.repeat(lambda: [fn(r) for r in rows], number=1, repeat=REPEAT))
+        results[name] = best
+        print(f'{name:<26} {best * 1000:8.1f} ms  {size_mb / best:7.1f} MB/s')
+
+    legacy, fast = results.values()
+    print(f'speedup: {legacy / fast:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from dump_parser import resolve_dump_path
+from schema_model import diff_schemas, has_drift, schema_from_dump, schema_from_migrations
+
+root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
+dump_path = resolve_dump_path(root / 'db' / 'lovetofly-portal-full-dump.sql')
+
+SECTIONS = [
+    ('missing_tables', 'Tabelas das migrations ausentes no dump'),
+    ('extra_tables', 'Tabelas do dump sem migration'),
+    ('missing_columns', 'Colunas ausentes no dump'),
+    ('extra_columns', 'Colunas do dump sem migration'),
+    ('mismatched_columns', 'Colunas divergentes'),
+    ('missing_constraints', 'Constraints ausentes no dump'),
+    ('extra_constraints', 'Constraints do dump sem migration'),
+    ('mismatched_constraints', 'Constraints divergentes'),
+    ('missing_indexes', 'Índices ausentes no dump'),
+    ('extra_indexes', 'Índices do dump sem migration'),
+    ('mismatched_indexes', 'Índices divergentes'),
+    ('missing_views', 'Views das migrations ausentes no dump'),
+    ('extra_views', 'Views do dump sem migration'),
+]
+
+
+def describe(item):
+    if isinstance(item, str):
+        return item
+    if 'field' in item:
+        what = item.get('column') or item.get('name')
+        return f"{item['table']}.{what}: {item['field']} esperado {item['expected']!r}, no dump {item['actual']!r}"
+    if 'column' in item:
+        return f"{item['table']}.{item['column']} ({item['type']})"
+    return f"{item['table']}: {item['name']} ({item.get('type') or ', '.join(item['columns'])})"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Reaplica o DDL das migrations (sem servidor PostgreSQL) e compara com o schema do dump.'
+    )
+    parser.add_argument('--dump', default=str(dump_path), help='Caminho do dump')
+    parser.add_argument('--json', help='Grava o relatório completo em JSON neste caminho')
+    parser.add_argument('--warnings', action='store_true', help='Lista os avisos da reaplicação das migrations')
+    args = parser.parse_args()
+
+    path = Path(args.dump)
+    if not path.exists():
+        raise SystemExit(f'Dump not found: {path}')
+
+    expected = schema_from_migrations(root)
+    actual = schema_from_dump(path)
+    report = diff_schemas(expected, actual)
+
+    for key, title in SECTIONS:
+        if report[key]:
+            print(f'{title} ({len(report[key])}):')
+            for item in report[key]:
+                print(f'  - {describe(item)}')
+    print(f'{len(expected.warnings)} aviso(s) ao reaplicar as migrations')
+    if args.warnings:
+        for warning in expected.warnings:
+            print(f'  - {warning}')
+
+    if args.json:
+        Path(args.json).write_text(
+            json.dumps({'drift': report, 'warnings': expected.warnings}, indent=2, ensure_ascii=False),
+            encoding='utf-8',
+        )
+        print(f'Wrote {args.json}')
+
+    if has_drift(report):
+        print('Schema divergente entre src/migrations e o dump.', file=sys.stderr)
+        sys.exit(1)
+    print('Schema das migrations confere com o dump.')
+
+
+if __name__ == '__main__':
+    main()
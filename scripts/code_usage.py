@@ -0,0 +1,321 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from collections import defaultdict, deque
+
+from sql_extract import WRITE_KINDS, extract_table_refs, normalize_table_name
+from worker_pool import map_tasks
+
+# Table-name search over the project sources. All names go into one
+# Aho-Corasick automaton, so each file is scanned once no matter how many
+# tables are looked up, and a hit only counts on identifier boundaries
+# ("public.users" does not match inside "public.users_backup").
+#
+# Read/write classification comes from the SQL statements sql_extract pulls
+# out of each file. Both results are kept per file in a persistent index
+# (db/code-usage.index.json) together with the file's size, mtime and
+# sha256, so a run only re-reads the files that changed since the previous
+# one.
+
+SOURCE_EXTENSIONS = ('.ts', '.tsx', '.js', '.sql')
+EXCLUDED_DIRS = {'node_modules'}
+IDENTIFIER_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+IDENTIFIER_BYTES = frozenset(c.encode()[0] for c in IDENTIFIER_CHARS)
+
+INDEX_VERSION = 3
+
+
+class TableMatcher:
+    # Works on str, or on bytes when built from bytes names.
+    __slots__ = ('goto', 'fail', 'out', 'ident', 'start_re')
+
+    def __init__(self, names):
+        names = [name for name in dict.fromkeys(names) if name]
+        binary = bool(names) and isinstance(names[0], bytes)
+        self.ident = IDENTIFIER_BYTES if binary else IDENTIFIER_CHARS
+        self.goto = [{}]
+        self.out = [[]]
+        for name in names:
+            state = 0
+            for ch in name:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(name)
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        # From the root state, jump straight to the next place a name can
+        # start: an identifier start for names beginning with one, anywhere
+        # for the rest.
+        firsts = sorted(self.goto[0])
+        join = bytes if binary else ''.join
+        word = join(c for c in firsts if c in self.ident)
+        other = join(c for c in firsts if c not in self.ident)
+        parts = []
+        if word:
+            parts.append(r'(?<![A-Za-z0-9_])[' + re.escape(word.decode() if binary else word) + ']')
+        if other:
+            parts.append('[' + re.escape(other.decode('latin-1') if binary else other) + ']')
+        pattern = '|'.join(parts)
+        self.start_re = re.compile(pattern.encode('latin-1') if binary else pattern) if parts else None
+
+    def find_all(self, text):
+        # Yields (offset, name) for every boundary-respecting occurrence,
+        # overlapping ones included, in order of their end offset.
+        if self.start_re is None:
+            return
+        goto, fail, out, ident = self.goto, self.fail, self.out, self.ident
+        search = self.start_re.search
+        n = len(text)
+        state = 0
+        i = 0
+        while i < n:
+            if state == 0:
+                m = search(text, i)
+                if not m:
+                    return
+                i = m.start()
+            ch = text[i]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            i += 1
+            for name in out[state]:
+                start = i - len(name)
+                if start > 0 and name[0] in ident and text[start - 1] in ident:
+                    continue
+                if i < n and name[-1] in ident and text[i] in ident:
+                    continue
+                yield start, name
+
+    def names_in(self, text):
+        return {name for _, name in self.find_all(text)}
+
+
+def iter_code_paths(root: Path, search_roots=None):
+    # Source files under `search_roots` (default: the whole project), grouped
+    # by extension in SOURCE_EXTENSIONS order and skipping EXCLUDED_DIRS.
+    # A search root may also be a single source file.
+    by_ext = defaultdict(list)
+    for base in [root] if search_roots is None else search_roots:
+        if base.is_file():
+            if base.suffix in SOURCE_EXTENSIONS:
+                by_ext[base.suffix].append(base)
+            continue
+        if not base.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(base):
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDED_DIRS]
+            for filename in filenames:
+                suffix = os.path.splitext(filename)[1]
+                if suffix in SOURCE_EXTENSIONS:
+                    by_ext[suffix].append(Path(dirpath) / filename)
+    for ext in SOURCE_EXTENSIONS:
+        yield from by_ext[ext]
+
+
+class SourceCorpus:
+    # Raw bytes of every source file under `search_roots`, read once, for
+    # answering many reference lookups without touching the tree again.
+
+    def __init__(self, root: Path, search_roots=None):
+        self.root = root
+        self.files = {}
+        for path in iter_code_paths(root, search_roots):
+            try:
+                self.files[str(path.relative_to(root))] = path.read_bytes()
+            except Exception:
+                continue
+
+    def find_references(self, forms_by_key, workers=None):
+        # Keys of `forms_by_key` ({key: [form, ...]}) for which any form
+        # appears in some file; one automaton pass over each file for all
+        # keys together, files spread over a process pool.
+        owners = defaultdict(list)
+        for key, forms in forms_by_key.items():
+            for form in forms:
+                owners[form.encode('utf-8')].append(key)
+        found = set()
+        for forms in map_tasks(match_file, list(self.files.values()), workers, init_scan_worker, (list(owners),)):
+            for form in forms:
+                found.update(owners[form])
+        return found
+
+
+def scan_source(matcher, content, suffix):
+    # Index entry fields for one file: the table names mentioned anywhere in
+    # it, and the [line, table, kind] references of its SQL statements.
+    return {
+        'tables': sorted(matcher.names_in(content)),
+        'sql': [list(ref) for ref in extract_table_refs(content, suffix)],
+    }
+
+
+_worker_state = {}
+
+
+def init_scan_worker(names):
+    _worker_state['matcher'] = TableMatcher(names)
+
+
+def match_file(data):
+    return _worker_state['matcher'].names_in(data)
+
+
+def scan_file(task):
+    # Index entry for one source file; 'tables' is None when the content
+    # hash still matches `known_sha256` (only the mtime moved). None if the
+    # file cannot be read.
+    path, _, known_sha256 = task
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    except Exception:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest, 'tables': None}
+    if digest != known_sha256:
+        content = data.decode('utf-8', errors='ignore')
+        entry.update(scan_source(_worker_state['matcher'], content, os.path.splitext(path)[1]))
+    return entry
+
+
+class CodeUsageIndex:
+    # Persistent file -> referenced tables map for a set of table names
+    # (the vocabulary). Asking about names outside the vocabulary widens it
+    # and re-scans every file once; otherwise only new or changed files are
+    # read.
+
+    def __init__(self, root: Path, path: Path = None):
+        self.root = root
+        self.path = path or root / 'db' / 'code-usage.index.json'
+        self.names = []
+        self.files = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = None
+            if data and data.get('version') == INDEX_VERSION:
+                self.names = data['names']
+                self.files = data['files']
+
+    def update(self, table_names, search_roots=None, workers=None):
+        # Brings the entries of the files under `search_roots` up to date and
+        # returns their relative paths in scan order. New or changed files
+        # are scanned in a process pool.
+        missing = set(table_names) - set(self.names)
+        if missing:
+            self.names = sorted(set(self.names) | missing)
+            self.files = {}
+            self.dirty = True
+        listed = []
+        pending = []
+        for path in iter_code_paths(self.root, search_roots):
+            rel = str(path.relative_to(self.root))
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            listed.append(rel)
+            entry = self.files.get(rel)
+            if not (entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns):
+                pending.append((str(path), rel, entry['sha256'] if entry else None))
+        results = map_tasks(scan_file, pending, workers, init_scan_worker, (self.names,))
+        failed = set()
+        for (_, rel, _), result in zip(pending, results):
+            if result is None:
+                failed.add(rel)
+            elif result['tables'] is None:
+                self.files[rel]['mtime_ns'] = result['mtime_ns']
+            else:
+                self.files[rel] = result
+            self.dirty = True
+        scanned = [rel for rel in listed if rel not in failed]
+        seen = set(scanned)
+        for rel in [rel for rel in self.files if rel not in seen]:
+            if not (self.root / rel).exists():
+                del self.files[rel]
+                self.dirty = True
+        return scanned
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': INDEX_VERSION, 'names': self.names, 'files': self.files}), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def tables_in(self, rel):
+        entry = self.files.get(rel)
+        return list(entry['tables']) if entry else []
+
+    def files_for(self, table_name, files=None):
+        return [rel for rel in (self.files if files is None else files) if table_name in self.files[rel]['tables']]
+
+
+def load_code_index(root: Path, table_names, search_roots=None, workers=None):
+    # (index, files): the saved index refreshed for `table_names`, and the
+    # scanned files under `search_roots` in scan order.
+    index = CodeUsageIndex(root)
+    files = index.update(table_names, search_roots, workers)
+    index.save()
+    return index, files
+
+
+def find_table_usage(root: Path, table_names, search_roots=None, workers=None):
+    # Maps each table name to the source files (relative to `root`) that
+    # mention it, in scan order: by its name as given anywhere in the file,
+    # or as one of the file's SQL statements resolve it (so "public.users"
+    # is found in a bare "FROM users", as in find_read_write).
+    index, files = load_code_index(root, table_names, search_roots, workers)
+    normalized = [(name, normalize_table_name(name)) for name in table_names]
+    usage = defaultdict(list)
+    for rel in files:
+        entry = index.files[rel]
+        refs = set(entry['tables'])
+        refs.update(table for _, table, _ in entry['sql'])
+        for name, resolved in normalized:
+            if name in refs or resolved in refs:
+                usage[name].append(rel)
+    return usage
+
+
+def find_read_write(root: Path, table_names, search_roots=None, read_kinds=('read',), workers=None):
+    # (reads, writes): table -> set of files with a SQL statement that reads
+    # it (one of `read_kinds`: read for FROM/USING, join) or writes it
+    # (insert, update, delete). Names are compared as PostgreSQL resolves
+    # them, so "public.users" matches a bare "FROM users".
+    index, files = load_code_index(root, table_names, search_roots, workers)
+    wanted = defaultdict(list)
+    for name in table_names:
+        wanted[normalize_table_name(name)].append(name)
+    reads = defaultdict(set)
+    writes = defaultdict(set)
+    for rel in files:
+        for _, table, kind in index.files[rel]['sql']:
+            for name in wanted.get(table, ()):
+                if kind in WRITE_KINDS:
+                    writes[name].add(rel)
+                elif kind in read_kinds:
+                    reads[name].add(rel)
+    return reads, writes
+
@@ -0,0 +1,199 @@
+import re
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+from dump_parser import iter_dump
+from row_overlap import HyperLogLog
+
+# Single-pass column profiler over the dump's event stream. Every column of
+# every COPY section gets constant-memory accumulators: null count, a
+# HyperLogLog distinct estimate, min/max (numeric for numeric types, text
+# otherwise), total width for the average length and a Space-Saving summary
+# for the most frequent values. The latest activity of a table (the newest
+# value of its created_at/updated_at/last_*/date columns) comes out of the
+# same pass: each such column keeps only its largest ISO-looking value, and
+# only those are parsed with datetime.fromisoformat at the end.
+#
+# Columns that look like secrets or personal data (password hashes, tokens,
+# CPF, e-mail, phone, names, addresses, birth dates, document scans, ...)
+# get only the value-free statistics: their min, max and most frequent
+# values are never kept, so the profile JSON and the report don't copy them
+# out of the dump.
+
+TOP_K = 5
+SPACE_SAVING_CAPACITY = 20
+TOP_VALUE_CHARS = 80
+NUMERIC_TYPES = ('int', 'serial', 'numeric', 'decimal', 'real', 'double', 'float', 'money')
+ACTIVITY_MARKERS = ('created_at', 'updated_at', 'last_', 'date')
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+# Matched against the column name lowercased with underscores removed, so
+# password_reset_code and passwordResetCode are caught alike.
+SENSITIVE_MARKERS = (
+    'password', 'passwd', 'hash', 'token', 'secret', 'privatekey', 'apikey', 'resetcode',
+    'cpf', 'cnpj', 'email', 'phone', 'ipaddress', 'useragent', 'document', 'canacnumber',
+    'firstname', 'lastname', 'fullname', 'middlename', 'surname', 'birth',
+    'address', 'street', 'zipcode', 'postalcode', 'selfie', 'resume', 'linkedin',
+)
+# Matched against the whole words of the column name (snake or camel case):
+# short markers that would hit unrelated names as substrings ("cep" in
+# accepted_*), and a bare "name", which on a person's row is the person's.
+SENSITIVE_WORDS = ('cep', 'zip', 'dob', 'nome')
+SENSITIVE_COLUMNS = ('name',)
+WORD_SPLIT_RE = re.compile(r'_|(?<=[a-z0-9])(?=[A-Z])')
+
+
+def value_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def is_numeric_type(col_type: str) -> bool:
+    t = col_type.lower()
+    return any(n in t for n in NUMERIC_TYPES) and 'interval' not in t and not t.endswith('[]')
+
+
+def is_activity_column(column: str) -> bool:
+    return any(marker in column for marker in ACTIVITY_MARKERS)
+
+
+def is_sensitive_column(column: str) -> bool:
+    if column.lower() in SENSITIVE_COLUMNS:
+        return True
+    name = column.lower().replace('_', '')
+    if any(marker in name for marker in SENSITIVE_MARKERS):
+        return True
+    words = {word.lower() for word in WORD_SPLIT_RE.split(column)}
+    return any(word in words for word in SENSITIVE_WORDS)
+
+
+class SpaceSaving:
+    # Metwally et al.: at most `capacity` counters; an unseen value takes
+    # over the smallest counter and inherits its count as error.
+
+    def __init__(self, capacity=SPACE_SAVING_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, value):
+        counts = self.counts
+        if value in counts:
+            counts[value] += 1
+        elif len(counts) < self.capacity:
+            counts[value] = 1
+            self.errors[value] = 0
+        else:
+            victim = min(counts, key=counts.get)
+            floor = counts.pop(victim)
+            del self.errors[victim]
+            counts[value] = floor + 1
+            self.errors[value] = floor
+
+    def top(self, k=TOP_K):
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [[value, count, self.errors[value]] for value, count in ranked]
+
+
+class ColumnProfile:
+
+    def __init__(self, col_type: str, activity: bool, sensitive: bool = False):
+        self.numeric = is_numeric_type(col_type)
+        self.activity = activity
+        self.sensitive = sensitive
+        self.count = 0
+        self.nulls = 0
+        self.width = 0
+        self.min = None
+        self.max = None
+        self.latest = None       # largest ISO-looking value (activity columns)
+        self.hll = HyperLogLog()
+        self.top = SpaceSaving()
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+        self.width += len(value)
+        self.hll.add_hash(value_hash(value))
+        if self.activity and value and ISO_DATE_RE.match(value) and (self.latest is None or value > self.latest):
+            self.latest = value
+        if self.sensitive:
+            return
+        self.top.add(value[:TOP_VALUE_CHARS])
+        key = value
+        if self.numeric:
+            try:
+                key = float(value)
+            except ValueError:
+                key = None
+        if key is not None:
+            if self.min is None or key < self.min[0]:
+                self.min = (key, value)
+            if self.max is None or key > self.max[0]:
+                self.max = (key, value)
+
+    def result(self):
+        present = self.count - self.nulls
+        distinct = round(self.hll.estimate()) if present else 0
+        return {
+            'nulls': self.nulls,
+            'null_ratio': self.nulls / self.count if self.count else 0.0,
+            'distinct': min(distinct, present),
+            'min': self.min[1] if self.min else None,
+            'max': self.max[1] if self.max else None,
+            'avg_width': self.width / present if present else 0.0,
+            'top': self.top.top(),
+            'sensitive': self.sensitive,
+        }
+
+
+def latest_activity(candidates):
+    # Newest datetime among the columns' largest values, parsed the way the
+    # reports always did (Z as +00:00); unparsable or incomparable values
+    # (naive vs aware) are skipped.
+    latest = None
+    for value in candidates:
+        try:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            if not latest or dt > latest:
+                latest = dt
+        except Exception:
+            pass
+    return latest
+
+
+def profile_events(events):
+    # {table: {'rows', 'latest_activity', 'columns': {column: {...}}}} from
+    # a decoded event stream; columns follow the COPY column list.
+    types = {}
+    profiles = {}
+    current = None
+    for kind, table_name, payload in events:
+        if kind == 'table':
+            types[table_name] = dict(payload)
+        elif kind == 'copy':
+            col_types = types.get(table_name, {})
+            current = [
+                (c, ColumnProfile(col_types.get(c, ''), is_activity_column(c), is_sensitive_column(c)))
+                for c in payload
+            ]
+            profiles[table_name] = {'rows': 0, 'columns': current}
+        elif kind == 'row':
+            profiles[table_name]['rows'] += 1
+            width = len(payload)
+            for i, (_, profile) in enumerate(current):
+                profile.add(payload[i] if i < width else None)
+    result = {}
+    for table_name, entry in profiles.items():
+        latest = latest_activity(p.latest for _, p in entry['columns'] if p.latest)
+        result[table_name] = {
+            'rows': entry['rows'],
+            'latest_activity': latest.isoformat() if latest else None,
+            'columns': {c: p.result() for c, p in entry['columns']},
+        }
+    return result
+
+
+def profile_dump(path: Path):
+    return profile_events(iter_dump(path))
@@ -0,0 +1,371 @@
+import io
+import os
+import re
+import json
+import mmap
+import hashlib
+from itertools import islice, takewhile
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from dump_parser import (
+    iter_dump,
+    iter_events,
+    collect_tables,
+    count_rows,
+    decode_row,
+    is_plain_dump,
+    parse_copy_header,
+    project_rows,
+)
+from pg_archive import is_archive, iter_archive_events
+
+# Sidecar index of a plain-SQL dump: byte offset, length and line count of
+# every CREATE TABLE block and COPY section. It is written next to the dump
+# as <dump>.index.json and rebuilt only when the dump's size, mtime or
+# sha256 no longer match, so single-table reads can seek() straight to the
+# section they need instead of scanning the whole file. Compressed dumps
+# and pg_dump archives cannot be indexed this way, so every entry point here
+# falls back to the streaming reader in dump_parser for them.
+
+INDEX_VERSION = 1
+HASH_CHUNK = 1024 * 1024
+DECODE_CHUNK_BYTES = 1024 * 1024
+COUNT_WINDOW = 16 * 1024 * 1024
+DECODE_IN_FLIGHT_PER_WORKER = 2
+
+SECTION_START_RE = re.compile(rb'^(?:CREATE TABLE |COPY )', re.M)
+TABLE_END_RE = re.compile(rb'^\);\s*$', re.M)
+
+
+def index_path_for(path: Path) -> Path:
+    return path.with_name(path.name + '.index.json')
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def count_newlines(buf, start: int, end: int) -> int:
+    view = memoryview(buf)
+    total = 0
+    for pos in range(start, end, COUNT_WINDOW):
+        total += view[pos:min(pos + COUNT_WINDOW, end)].tobytes().count(b'\n')
+    view.release()
+    return total
+
+
+def line_end(mm, pos: int) -> int:
+    # Offset just past the line containing `pos` (newline included).
+    nl = mm.find(b'\n', pos)
+    return len(mm) if nl < 0 else nl + 1
+
+
+def find_copy_terminator(mm, header_nl: int):
+    # Position of the newline preceding the "\." line that closes a COPY
+    # section, or -1 if the section runs to EOF.
+    pos = header_nl
+    while True:
+        pos = mm.find(b'\n\\.', pos)
+        if pos < 0:
+            return -1
+        after = mm[pos + 3:pos + 5]
+        if after[:1] in (b'', b'\n') or after == b'\r\n':
+            return pos
+        pos += 1
+
+
+def scan_sections(mm):
+    # Byte-level walk over a mapped dump, following the same rules as
+    # dump_parser.iter_events but without decoding or splitting rows.
+    # Yields ('table', name, start, end, lines) and
+    # ('copy', (name, columns), start, end, lines, rows).
+    size = len(mm)
+    pos = 0
+    while True:
+        m = SECTION_START_RE.search(mm, pos)
+        if not m:
+            return
+        start = m.start()
+        header_end = line_end(mm, start)
+        header = mm[start:header_end].decode('utf-8', errors='replace').rstrip('\n')
+        if m.group() == b'CREATE TABLE ':
+            table_name = header.split('CREATE TABLE ')[1].split(' (')[0].strip()
+            close = TABLE_END_RE.search(mm, header_end)
+            end = line_end(mm, close.start()) if close else size
+            lines = count_newlines(mm, start, end) + (0 if mm[end - 1:end] == b'\n' else 1)
+            yield 'table', table_name, start, end, lines
+            pos = end
+            continue
+        copy_header = parse_copy_header(header)
+        if not copy_header:
+            pos = header_end
+            continue
+        if header_end == size and mm[size - 1:size] != b'\n':
+            yield 'copy', copy_header, start, size, 1, 0
+            return
+        term = find_copy_terminator(mm, header_end - 1)
+        if term < 0:
+            rows = count_newlines(mm, header_end, size) + (0 if mm[size - 1:size] == b'\n' else 1)
+            yield 'copy', copy_header, start, size, rows + 1, rows
+            return
+        rows = count_newlines(mm, header_end - 1, term)
+        end = line_end(mm, term + 1)
+        yield 'copy', copy_header, start, end, rows + 2, rows
+        pos = end
+
+
+def map_dump(path: Path):
+    # mmap of the dump, or b'' for an empty file (which cannot be mapped).
+    with path.open('rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def build_index(path: Path):
+    tables = {}
+    copies = {}
+    mm = map_dump(path)
+    try:
+        digest = hashlib.sha256(mm).hexdigest()
+        for kind, name, start, end, lines, *rest in scan_sections(mm):
+            if kind == 'table':
+                tables[name] = {'offset': start, 'length': end - start, 'lines': lines}
+            else:
+                table_name, cols = name
+                copies[table_name] = {
+                    'offset': start,
+                    'length': end - start,
+                    'lines': lines,
+                    'rows': rest[0],
+                    'columns': cols,
+                }
+    finally:
+        if isinstance(mm, mmap.mmap):
+            mm.close()
+    st = path.stat()
+    return {
+        'version': INDEX_VERSION,
+        'dump': {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest},
+        'tables': tables,
+        'copies': copies,
+    }
+
+
+def count_rows_fast(path: Path):
+    # Same (schema, counts) as dump_parser.count_rows, but rows are counted
+    # with newline scans over the mapped file: no per-line Python work and
+    # no text decoding outside the CREATE TABLE blocks and COPY headers.
+    if not is_plain_dump(path):
+        return count_rows(path)
+    schema = {}
+    counts = {}
+    mm = map_dump(path)
+    try:
+        for kind, name, start, end, lines, *rest in scan_sections(mm):
+            if kind == 'table':
+                block = io.StringIO(mm[start:end].decode('utf-8', errors='replace'), newline=None)
+                for _, table_name, columns in iter_events(block, decode=False):
+                    schema[table_name] = columns
+            else:
+                counts[name[0]] = rest[0]
+    finally:
+        if isinstance(mm, mmap.mmap):
+            mm.close()
+    return schema, counts
+
+
+def load_index(path: Path):
+    # Returns the index for `path`, building and saving it if the sidecar is
+    # missing or stale. When only the mtime changed (e.g. the dump was
+    # copied), the hash decides whether the stored offsets are still valid.
+    if not is_plain_dump(path):
+        raise ValueError(f'Cannot index compressed dump or archive: {path}')
+    idx_path = index_path_for(path)
+    st = path.stat()
+    if idx_path.exists():
+        try:
+            index = json.loads(idx_path.read_text(encoding='utf-8'))
+        except ValueError:
+            index = None
+        if index and index.get('version') == INDEX_VERSION:
+            key = index['dump']
+            if key['size'] == st.st_size:
+                if key['mtime_ns'] == st.st_mtime_ns:
+                    return index
+                if key['sha256'] == file_sha256(path):
+                    key['mtime_ns'] = st.st_mtime_ns
+                    idx_path.write_text(json.dumps(index), encoding='utf-8')
+                    return index
+    index = build_index(path)
+    idx_path.write_text(json.dumps(index), encoding='utf-8')
+    return index
+
+
+def iter_section_lines(f, section):
+    f.seek(section['offset'])
+    text = io.TextIOWrapper(f, encoding='utf-8', errors='replace')
+    try:
+        yield from islice(text, section['lines'])
+    finally:
+        text.detach()
+
+
+def iter_table_events(path: Path, table_names, decode: bool = True, index=None):
+    # Same event stream as dump_parser.iter_dump, restricted to the
+    # CREATE TABLE and COPY sections of `table_names` (in that order; dump
+    # order for compressed dumps).
+    if not is_plain_dump(path):
+        names = set(table_names)
+        events = iter_archive_events(path, names, decode) if is_archive(path) else iter_dump(path, decode)
+        yield from (e for e in events if e[1] in names)
+        return
+    index = index or load_index(path)
+    with path.open('rb') as f:
+        for table_name in table_names:
+            for key in ('tables', 'copies'):
+                section = index[key].get(table_name)
+                if section:
+                    yield from iter_events(iter_section_lines(f, section), decode)
+
+
+def parse_tables(path: Path, table_names, index=None):
+    # Like dump_parser.parse_dump, but only reads the sections of
+    # `table_names`.
+    return collect_tables(iter_table_events(path, sorted(table_names), decode=False, index=index))
+
+
+def iter_copy_lines(f, section):
+    # Raw data lines of one COPY section, header and terminator excluded.
+    lines = iter_section_lines(f, section)
+    next(lines, None)
+    for line in lines:
+        line = line.rstrip('\n')
+        if line == '\\.':
+            break
+        yield line
+
+
+def read_table(path: Path, table_name, columns=None, where=None, index=None):
+    # Rows of one table as a TableRows, restricted to `columns` and to rows
+    # matching `where` (see dump_parser.parse_predicate), read by seeking to
+    # its COPY section.
+    if not is_plain_dump(path):
+        events = iter_table_events(path, [table_name], decode=False)
+        for kind, name, payload in events:
+            if kind == 'copy' and name == table_name:
+                lines = (line for _, _, line in takewhile(lambda e: e[0] == 'row', events))
+                return project_rows(lines, payload, columns, where)
+        raise KeyError(f'No COPY section for {table_name} in {path}')
+    index = index or load_index(path)
+    section = index['copies'].get(table_name)
+    if section is None:
+        raise KeyError(f'No COPY section for {table_name} in {path}')
+    with path.open('rb') as f:
+        return project_rows(iter_copy_lines(f, section), section['columns'], columns, where)
+
+
+def table_row_counts(path: Path, table_names=None, index=None):
+    if not is_plain_dump(path):
+        _, counts = count_rows(path)
+        return {t: counts[t] for t in (counts if table_names is None else table_names) if t in counts}
+    index = index or load_index(path)
+    copies = index['copies']
+    if table_names is None:
+        return {t: s['rows'] for t, s in copies.items()}
+    return {t: copies[t]['rows'] for t in table_names if t in copies}
+
+
+def split_copy_data(mm, start: int, end: int, chunk_bytes: int):
+    # Byte ranges covering mm[start:end], cut at line boundaries roughly
+    # every `chunk_bytes`.
+    ranges = []
+    while end - start > chunk_bytes:
+        cut = line_end(mm, start + chunk_bytes)
+        if cut >= end:
+            break
+        ranges.append((start, cut))
+        start = cut
+    ranges.append((start, end))
+    return ranges
+
+
+def decode_chunk(task):
+    # Decoded rows of the COPY data lines in one byte range of the dump,
+    # up to the section terminator.
+    path, start, end = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        buf = f.read(end - start)
+    rows = []
+    for line in io.TextIOWrapper(io.BytesIO(buf), encoding='utf-8', errors='replace'):
+        line = line.rstrip('\n')
+        if line == '\\.':
+            break
+        rows.append(decode_row(line))
+    return rows
+
+
+def iter_dump_parallel(path: Path, workers=None, chunk_bytes=DECODE_CHUNK_BYTES):
+    # Same event stream as dump_parser.iter_dump, with the COPY rows of a
+    # plain dump decoded in a process pool: the sections found by
+    # scan_sections are cut at line boundaries into chunks of about
+    # `chunk_bytes`, up to DECODE_IN_FLIGHT_PER_WORKER chunks per worker
+    # are decoded ahead, and the rows come back in dump order. Other dumps
+    # and single-worker runs use the serial reader.
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or not is_plain_dump(path):
+        yield from iter_dump(path)
+        return
+    mm = map_dump(path)
+
+    def plan():
+        # The events, with a ('chunk', table, (start, end)) for each range
+        # of COPY data lines in place of its rows.
+        for kind, name, start, end, lines, *rest in scan_sections(mm):
+            if kind == 'table':
+                block = io.StringIO(mm[start:end].decode('utf-8', errors='replace'), newline=None)
+                yield from iter_events(block, decode=False)
+                continue
+            table_name, columns = name
+            yield 'copy', table_name, columns
+            data_start = line_end(mm, start)
+            if data_start < end:
+                for chunk in split_copy_data(mm, data_start, end, chunk_bytes):
+                    yield 'chunk', table_name, chunk
+            yield 'copy_end', table_name, rest[0]
+
+    limit = workers * DECODE_IN_FLIGHT_PER_WORKER
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        items = plan()
+        pending = deque()       # planned events, chunks holding their future
+        in_flight = 0
+        while True:
+            if in_flight < limit:
+                for kind, table_name, payload in items:
+                    if kind == 'chunk':
+                        payload = pool.submit(decode_chunk, (str(path), *payload))
+                        in_flight += 1
+                    pending.append((kind, table_name, payload))
+                    if in_flight >= limit:
+                        break
+            if not pending:
+                return
+            kind, table_name, payload = pending.popleft()
+            if kind != 'chunk':
+                yield kind, table_name, payload
+                continue
+            in_flight -= 1
+            for values in payload.result():
+                yield 'row', table_name, values
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if isinstance(mm, mmap.mmap):
+            mm.close()
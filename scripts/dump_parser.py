@@ -0,0 +1,386 @@
+import io
+import re
+import bz2
+import gzip
+import lzma
+import operator
+from pathlib import Path
+
+# Shared reader for the plain-SQL pg_dump in db/. The dump is read line by
+# line, so memory stays flat no matter how large the file is; only what the
+# caller keeps from the event stream is held. gzip/bz2/xz dumps are
+# detected by their magic bytes and decompressed on the fly; pg_dump custom
+# and directory archives are read through pg_archive.
+
+COPY_RE = re.compile(r'^COPY\s+([^\s]+)\s*\((.*)\)\s+FROM\s+stdin;\s*$')
+COLUMN_SKIP_PREFIXES = ('CONSTRAINT', 'PRIMARY KEY', 'UNIQUE', 'FOREIGN KEY')
+
+READ_BUFFER = 4 * 1024 * 1024
+DUMP_SUFFIXES = ('', '.gz', '.bz2', '.xz')
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+)
+DECOMPRESSORS = {
+    'gzip': gzip.GzipFile,
+    'bz2': bz2.BZ2File,
+    'xz': lzma.LZMAFile,
+}
+
+
+class _Missing:
+    # Marks a value absent from a short COPY row. Pickles by name so the
+    # identity check survives a trip through a worker process.
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'MISSING'
+
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+COPY_ESCAPE_RE = re.compile(r'((?:\\(?:[0-7]{1,3}|x[0-9A-Fa-f]{1,2}))+)|\\(.)', re.S)
+BYTE_ESCAPE_RE = re.compile(r'\\(?:([0-7]{1,3})|x([0-9A-Fa-f]{1,2}))')
+SIMPLE_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+
+CONDITION_RE = re.compile(
+    r"""\s*("[^"]+"|\w+)\s*(?:(<>|!=|<=|>=|=|<|>)\s*(?:'((?:[^']|'')*)'|(-?\d+(?:\.\d+)?))|IS\s+(NOT\s+)?NULL)\s*""",
+    re.I,
+)
+AND_RE = re.compile(r'AND\b', re.I)
+PREDICATE_OPS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _decode_byte_escapes(run: str) -> str:
+    # Octal/hex escapes are raw bytes in the dump encoding (UTF-8), so a run
+    # of them may spell one multi-byte character.
+    data = bytes(
+        int(octal, 8) & 0xFF if octal else int(hexa, 16)
+        for octal, hexa in BYTE_ESCAPE_RE.findall(run)
+    )
+    return data.decode('utf-8', errors='replace')
+
+
+def _replace_escape(m) -> str:
+    if m.group(1) is not None:
+        return _decode_byte_escapes(m.group(1))
+    c = m.group(2)
+    return SIMPLE_ESCAPES.get(c, c)
+
+
+def unescape_pg(value: str) -> str:
+    # Single left-to-right pass over the COPY text-format escapes: \b \f \n
+    # \r \t \v, octal \NNN, hex \xHH, and \<any> for that character (so
+    # "\\t" is a backslash followed by "t", not a tab).
+    if '\\' not in value:
+        return value
+    return COPY_ESCAPE_RE.sub(_replace_escape, value)
+
+
+def decode_field(value: str):
+    if '\\' not in value:
+        return value
+    if value == '\\N':
+        return None
+    return COPY_ESCAPE_RE.sub(_replace_escape, value)
+
+
+def decode_row(row: str):
+    if '\\' not in row:
+        return row.split('\t')
+    return [decode_field(v) for v in row.split('\t')]
+
+
+def parse_copy_header(line: str):
+    m = COPY_RE.match(line)
+    if not m:
+        return None
+    cols = [c.strip().strip('"') for c in m.group(2).split(',')]
+    return m.group(1), cols
+
+
+def parse_column_line(line: str):
+    l = line.strip()
+    if not l or l.startswith(COLUMN_SKIP_PREFIXES):
+        return None
+    if l.endswith(','):
+        l = l[:-1]
+    parts = l.split()
+    return parts[0].strip('"'), ' '.join(parts[1:])
+
+
+class RowView:
+    # Read-only view of one row of a TableRows; supports the dict-style
+    # access (row.get(c), row[c], keys/items) the report builders use.
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def get(self, column, default=None):
+        pos = self._table.positions.get(column)
+        if pos is None:
+            return default
+        value = self._table.data[pos][self._index]
+        return default if value is MISSING else value
+
+    def __getitem__(self, column):
+        value = self.get(column, MISSING)
+        if value is MISSING:
+            raise KeyError(column)
+        return value
+
+    def __contains__(self, column):
+        return self.get(column, MISSING) is not MISSING
+
+    def keys(self):
+        return [c for c in self._table.columns if c in self]
+
+    def items(self):
+        return [(c, self[c]) for c in self.keys()]
+
+    def __repr__(self):
+        return f'RowView({dict(self.items())!r})'
+
+
+class TableRows:
+    # Column-oriented rows of one COPY section: a shared header plus one list
+    # per column, instead of one dict per row.
+    __slots__ = ('columns', 'positions', 'data', 'size')
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.positions = {c: i for i, c in enumerate(self.columns)}
+        self.data = [[] for _ in self.columns]
+        self.size = 0
+
+    def append(self, values):
+        # Mirrors dict(zip(columns, values)): extra values are dropped and
+        # missing trailing ones are absent from the row.
+        n = len(values)
+        for i, column in enumerate(self.data):
+            column.append(values[i] if i < n else MISSING)
+        self.size += 1
+
+    def extend(self, other):
+        for column, values in zip(self.data, other.data):
+            column.extend(values)
+        self.size += other.size
+
+    def column(self, name):
+        return self.data[self.positions[name]]
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return RowView(self, index)
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield RowView(self, i)
+
+
+def iter_events(lines, decode: bool = True):
+    # Yields ('table', name, [(col, type), ...]) for each CREATE TABLE,
+    # ('copy', name, [col, ...]) when a COPY section starts,
+    # ('row', name, values) for each data line and
+    # ('copy_end', name, row_count) when the section ends.
+    # With decode=False the row value is the raw COPY line.
+    lines = (line.rstrip('\n') for line in lines)
+    for line in lines:
+        if line.startswith('CREATE TABLE '):
+            table_name = line.split('CREATE TABLE ')[1].split(' (')[0].strip()
+            columns = []
+            for l in lines:
+                if l.rstrip() == ');':
+                    break
+                column = parse_column_line(l)
+                if column:
+                    columns.append(column)
+            yield 'table', table_name, columns
+        elif line.startswith('COPY '):
+            header = parse_copy_header(line)
+            if not header:
+                continue
+            table_name, cols = header
+            yield 'copy', table_name, cols
+            count = 0
+            for row in lines:
+                if row == '\\.':
+                    break
+                count += 1
+                yield 'row', table_name, decode_row(row) if decode else row
+            yield 'copy_end', table_name, count
+
+
+def parse_predicate(where: str):
+    # "created_at >= '2026-01-01' AND user_id = 7 AND deleted_at IS NULL"
+    # -> [(column, op, value), ...]. Quoted literals compare as text (fine
+    # for ISO dates), bare numbers compare numerically.
+    conditions = []
+    pos = 0
+    while True:
+        m = CONDITION_RE.match(where, pos)
+        if not m:
+            raise ValueError(f'Unsupported predicate: {where!r}')
+        column, op, text, number, negated = m.groups()
+        column = column.strip('"')
+        if op is None:
+            conditions.append((column, 'IS NOT NULL' if negated else 'IS NULL', None))
+        elif number is not None:
+            conditions.append((column, op, float(number)))
+        else:
+            conditions.append((column, op, text.replace("''", "'")))
+        pos = m.end()
+        if pos == len(where):
+            return conditions
+        m = AND_RE.match(where, pos)
+        if not m:
+            raise ValueError(f'Unsupported predicate: {where!r}')
+        pos = m.end()
+
+
+def test_condition(value, op, expected) -> bool:
+    if op == 'IS NULL':
+        return value is None or value is MISSING
+    if op == 'IS NOT NULL':
+        return not (value is None or value is MISSING)
+    if value is None or value is MISSING:
+        return False
+    if isinstance(expected, float):
+        try:
+            value = float(value)
+        except ValueError:
+            return False
+    return PREDICATE_OPS[op](value, expected)
+
+
+def project_rows(lines, copy_columns, columns=None, where=None):
+    # Decodes raw COPY lines into a TableRows holding only `columns`, keeping
+    # rows that match `where` (a predicate string or parsed condition list).
+    # Each line is split only up to the last needed field, predicate fields
+    # are decoded first and only matching rows have their projection decoded.
+    positions = {c: i for i, c in enumerate(copy_columns)}
+    columns = list(copy_columns) if columns is None else list(columns)
+    conditions = parse_predicate(where) if isinstance(where, str) else list(where or [])
+    unknown = [c for c in columns + [c for c, _, _ in conditions] if c not in positions]
+    if unknown:
+        raise KeyError(f'Unknown column(s): {", ".join(unknown)}')
+    out_idx = [positions[c] for c in columns]
+    tests = [(positions[c], op, value) for c, op, value in conditions]
+    last = max(out_idx + [i for i, _, _ in tests], default=-1)
+    rows = TableRows(columns)
+    for line in lines:
+        fields = line.split('\t', last + 1)
+        n = len(fields)
+        if not all(test_condition(decode_field(fields[i]) if i < n else MISSING, op, value) for i, op, value in tests):
+            continue
+        rows.append([decode_field(fields[i]) if i < n else MISSING for i in out_idx])
+    return rows
+
+
+def resolve_dump_path(path: Path) -> Path:
+    # `path` itself if it exists, otherwise the first compressed sibling
+    # (dump.sql.gz, .bz2, .xz) that does; falls back to `path`.
+    for suffix in DUMP_SUFFIXES:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate
+    return path
+
+
+def detect_compression(path: Path):
+    with path.open('rb') as f:
+        head = f.read(6)
+    for magic, kind in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def is_plain_dump(path: Path) -> bool:
+    # Uncompressed plain-SQL dump: the only kind that can be mapped, indexed
+    # and seeked by line offset (see dump_index).
+    if path.is_dir():
+        return False
+    from pg_archive import is_archive
+    return not detect_compression(path) and not is_archive(path)
+
+
+def open_dump(path: Path, binary: bool = False):
+    # Plain or compressed dump as a stream with a large read buffer; text
+    # mode matches path.open('r', encoding='utf-8', errors='replace').
+    kind = detect_compression(path)
+    if kind:
+        stream = io.BufferedReader(DECOMPRESSORS[kind](str(path), 'rb'), buffer_size=READ_BUFFER)
+    else:
+        stream = open(path, 'rb', buffering=READ_BUFFER)
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+
+
+def iter_dump(path: Path, decode: bool = True):
+    from pg_archive import is_archive, iter_archive_events
+    if is_archive(path):
+        yield from iter_archive_events(path, decode=decode)
+        return
+    with open_dump(path) as f:
+        yield from iter_events(f, decode)
+
+
+def collect_tables(events, tables=None):
+    # Folds a decode=False event stream into (schema, data, copy_columns).
+    # data maps each table to a TableRows keyed by the COPY column list;
+    # pass `tables` to keep rows for only those tables.
+    schema = {}
+    data = {}
+    copy_columns = {}
+    for kind, table_name, payload in events:
+        if kind == 'table':
+            schema[table_name] = payload
+        elif kind == 'copy':
+            copy_columns[table_name] = payload
+            if table_name not in data and (tables is None or table_name in tables):
+                data[table_name] = TableRows(payload)
+        elif kind == 'row' and table_name in data:
+            data[table_name].append(decode_row(payload))
+    return schema, data, copy_columns
+
+
+def parse_dump(path: Path, tables=None):
+    from pg_archive import is_archive, parse_archive
+    if is_archive(path):
+        return parse_archive(path, tables)
+    return collect_tables(iter_dump(path, decode=False), tables)
+
+
+def count_rows(path: Path):
+    # Returns (schema, counts); counts has an entry for every COPY section,
+    # including empty ones.
+    schema = {}
+    counts = {}
+    for kind, table_name, payload in iter_dump(path, decode=False):
+        if kind == 'table':
+            schema[table_name] = payload
+        elif kind == 'copy_end':
+            counts[table_name] = payload
+    return schema, counts
@@ -0,0 +1,273 @@
+import os
+import json
+import hashlib
+import sqlite3
+from pathlib import Path
+
+from dump_parser import MISSING, TableRows
+from dump_index import HASH_CHUNK, count_rows_fast, file_sha256, iter_dump_parallel, table_row_counts
+
+# Parse-once cache of a dump: schema, per-table row counts and decoded rows
+# stored in a SQLite file next to the dump (<dump>.snapshot.sqlite). The
+# snapshot is keyed by the dump's sha256 (size and mtime are checked first
+# so an untouched dump is not re-hashed) and rebuilt when the content
+# changes, so the report scripts share one parse of the dump instead of
+# each re-reading it. Every data table gets an index on its first column
+# for ad-hoc lookups with the sqlite3 shell. Scripts that only need row
+# counts use a current snapshot if there is one and otherwise count the
+# dump directly, since building the snapshot costs a full decode.
+
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path_for(path: Path) -> Path:
+    return path.with_name(path.name + '.snapshot.sqlite')
+
+
+def dump_files(path: Path):
+    # The files whose content makes up the dump: the dump itself, or every
+    # file of a pg_dump directory archive.
+    if path.is_dir():
+        return sorted(p for p in path.iterdir() if p.is_file())
+    return [path]
+
+
+def dump_stat(path: Path):
+    files = dump_files(path)
+    stats = [p.stat() for p in files]
+    return sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0)
+
+
+def dump_sha256(path: Path) -> str:
+    if not path.is_dir():
+        return file_sha256(path)
+    h = hashlib.sha256()
+    for p in dump_files(path):
+        h.update(p.name.encode('utf-8') + b'\0')
+        with p.open('rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def read_meta(snapshot: Path):
+    conn = sqlite3.connect(f'file:{snapshot}?mode=ro', uri=True)
+    try:
+        return dict(conn.execute('SELECT key, value FROM meta'))
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+
+def write_snapshot(path: Path, snapshot: Path, digest: str, workers=None):
+    # Streams the dump into the snapshot: each COPY section goes straight
+    # into its data table through one executemany over the section's rows,
+    # so no table is held in memory. The rows are decoded in a process pool
+    # of `workers` (dump_index.iter_dump_parallel) while this process
+    # inserts them. A table with several COPY sections gets all their rows
+    # in one data table, so the sections must share a column list.
+    size, mtime_ns = dump_stat(path)
+    tmp = snapshot.with_name(snapshot.name + f'.{os.getpid()}.tmp')
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE TABLE tables (position INTEGER PRIMARY KEY, name TEXT, columns TEXT)')
+        conn.execute(
+            'CREATE TABLE copies (position INTEGER PRIMARY KEY, name TEXT, columns TEXT, '
+            'rows INTEGER, data_table TEXT)'
+        )
+        schema = {}
+        copies = {}     # name -> [columns, rows, data table, width]
+        events = iter_dump_parallel(path, workers)
+        for kind, name, payload in events:
+            if kind == 'table':
+                schema[name] = payload
+            elif kind == 'copy':
+                if name not in copies:
+                    data_table = f't{len(copies)}'
+                    # c0..cN hold the decoded values (NULL for \N); _width is
+                    # set only for short COPY lines, whose trailing values
+                    # are absent.
+                    value_columns = [f'c{j}' for j in range(len(payload))]
+                    conn.execute(f'CREATE TABLE {data_table} ({", ".join(value_columns + ["_width"])})')
+                    copies[name] = [payload, 0, data_table, len(payload)]
+                entry = copies[name]
+                if payload != entry[0]:
+                    raise ValueError(f'COPY sections of {name} have different column lists: {path}')
+                insert = f'INSERT INTO {entry[2]} VALUES ({", ".join("?" * (entry[3] + 1))})'
+                entry[1] += conn.executemany(insert, copy_section_rows(events, entry[3])).rowcount
+        conn.executemany(
+            'INSERT INTO meta VALUES (?, ?)',
+            [
+                ('version', str(SNAPSHOT_VERSION)),
+                ('sha256', digest),
+                ('size', str(size)),
+                ('mtime_ns', str(mtime_ns)),
+                ('dump', str(path)),
+            ],
+        )
+        conn.executemany(
+            'INSERT INTO tables VALUES (?, ?, ?)',
+            [(i, name, json.dumps(columns)) for i, (name, columns) in enumerate(schema.items())],
+        )
+        for i, (name, (columns, rows, data_table, width)) in enumerate(copies.items()):
+            conn.execute('INSERT INTO copies VALUES (?, ?, ?, ?, ?)', (i, name, json.dumps(columns), rows, data_table))
+            if width:
+                conn.execute(f'CREATE INDEX {data_table}_c0 ON {data_table} (c0)')
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, snapshot)
+
+
+def copy_section_rows(events, width):
+    # Snapshot rows of the COPY section `events` is positioned in, up to its
+    # copy_end event.
+    for kind, _, payload in events:
+        if kind != 'row':
+            return
+        yield snapshot_row(payload, width)
+
+
+def snapshot_row(values, width):
+    # Mirrors TableRows.append: extra values are dropped, and a short line
+    # records its width.
+    n = len(values)
+    if n >= width:
+        return (*values[:width], None)
+    return (*values, *(None,) * (width - n), n)
+
+
+def check_snapshot(path: Path, snapshot: Path):
+    # (current, digest): whether `snapshot` holds the dump's current content,
+    # and the dump's sha256 if it had to be computed. A snapshot whose dump
+    # was only touched (same content, new mtime) gets its mtime refreshed.
+    meta = read_meta(snapshot) if snapshot.exists() else None
+    if not meta or meta.get('version') != str(SNAPSHOT_VERSION):
+        return False, None
+    size, mtime_ns = dump_stat(path)
+    if meta['size'] == str(size) and meta['mtime_ns'] == str(mtime_ns):
+        return True, None
+    digest = dump_sha256(path)
+    if meta['sha256'] != digest:
+        return False, digest
+    conn = sqlite3.connect(snapshot)
+    with conn:
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'mtime_ns'", (str(mtime_ns),))
+    conn.close()
+    return True, digest
+
+
+def open_snapshot(snapshot: Path):
+    return sqlite3.connect(f'file:{snapshot}?mode=ro', uri=True)
+
+
+def load_snapshot(path: Path, workers=None):
+    # Returns a read-only connection to the snapshot of `path`, building it
+    # first if it is missing, from an older format or for other content.
+    snapshot = snapshot_path_for(path)
+    current, digest = check_snapshot(path, snapshot)
+    if not current:
+        write_snapshot(path, snapshot, digest or dump_sha256(path), workers)
+    return open_snapshot(snapshot)
+
+
+def read_rows(conn, data_table, columns):
+    rows = TableRows(columns)
+    width = len(rows.columns)
+    if not width:
+        return rows
+    records = conn.execute(f'SELECT * FROM {data_table} ORDER BY rowid').fetchall()
+    rows.data = [list(values) for values in zip(*records)][:width] or rows.data
+    rows.size = len(records)
+    for index, record in enumerate(records):
+        if record[width] is not None:
+            for column in rows.data[record[width]:]:
+                column[index] = MISSING
+    return rows
+
+
+def read_schema(conn):
+    return {
+        name: [tuple(c) for c in json.loads(columns)]
+        for name, columns in conn.execute('SELECT name, columns FROM tables ORDER BY position')
+    }
+
+
+def parse_dump_cached(path: Path, tables=None):
+    # Same (schema, data, copy_columns) as dump_parser.parse_dump, read from
+    # the snapshot.
+    conn = load_snapshot(path)
+    try:
+        schema = read_schema(conn)
+        copy_columns = {}
+        data = {}
+        for name, columns, data_table in conn.execute(
+            'SELECT name, columns, data_table FROM copies ORDER BY position'
+        ).fetchall():
+            copy_columns[name] = json.loads(columns)
+            if tables is None or name in tables:
+                data[name] = read_rows(conn, data_table, copy_columns[name])
+    finally:
+        conn.close()
+    return schema, data, copy_columns
+
+
+def iter_rows_cached(path: Path, table_names, workers=None):
+    # (name, TableRows) for each of `table_names`, read from the snapshot
+    # one table at a time so only one is held in memory; rows is None for a
+    # table without a COPY section.
+    conn = load_snapshot(path, workers)
+    try:
+        copies = {
+            name: (json.loads(columns), data_table)
+            for name, columns, data_table in conn.execute('SELECT name, columns, data_table FROM copies')
+        }
+        for name in table_names:
+            if name not in copies:
+                yield name, None
+                continue
+            columns, data_table = copies[name]
+            yield name, read_rows(conn, data_table, columns)
+    finally:
+        conn.close()
+
+
+def parse_tables_cached(path: Path, table_names):
+    # Same result as dump_index.parse_tables.
+    names = sorted(table_names)
+    schema, data, copy_columns = parse_dump_cached(path, names)
+    return (
+        {t: schema[t] for t in names if t in schema},
+        {t: data[t] for t in names if t in data},
+        {t: copy_columns[t] for t in names if t in copy_columns},
+    )
+
+
+def count_rows_cached(path: Path):
+    # Same (schema, counts) as dump_parser.count_rows: read from the snapshot
+    # when an up-to-date one exists, otherwise counted from the dump itself
+    # (dump_index.count_rows_fast); counts alone never build a snapshot.
+    snapshot = snapshot_path_for(path)
+    if not check_snapshot(path, snapshot)[0]:
+        return count_rows_fast(path)
+    conn = open_snapshot(snapshot)
+    try:
+        schema = read_schema(conn)
+        counts = dict(conn.execute('SELECT name, rows FROM copies ORDER BY position'))
+    finally:
+        conn.close()
+    return schema, counts
+
+
+def table_row_counts_cached(path: Path, table_names=None):
+    # Same as dump_index.table_row_counts, which it falls back to when there
+    # is no up-to-date snapshot.
+    if not check_snapshot(path, snapshot_path_for(path))[0]:
+        return table_row_counts(path, table_names)
+    _, counts = count_rows_cached(path)
+    return {t: counts[t] for t in (counts if table_names is None else table_names) if t in counts}
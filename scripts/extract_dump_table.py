@@ -0,0 +1,39 @@
+import csv
+import sys
+import argparse
+from pathlib import Path
+
+from dump_index import read_table
+from dump_parser import resolve_dump_path
+
+root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
+dump_path = resolve_dump_path(root / 'db' / 'lovetofly-portal-full-dump.sql')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extrai colunas/linhas de uma tabela do dump em CSV.')
+    parser.add_argument('table', help='Tabela qualificada, ex.: public.user_activity_log')
+    parser.add_argument('--columns', help='Colunas separadas por vírgula (padrão: todas)')
+    parser.add_argument('--where', help="Filtro simples, ex.: \"created_at >= '2026-01-01' AND user_id = 7\"")
+    parser.add_argument('--dump', default=str(dump_path), help='Caminho do dump')
+    args = parser.parse_args()
+
+    path = Path(args.dump)
+    if not path.exists():
+        raise SystemExit(f'Dump not found: {path}')
+
+    columns = [c.strip() for c in args.columns.split(',')] if args.columns else None
+    try:
+        rows = read_table(path, args.table, columns, args.where)
+    except (KeyError, ValueError) as e:
+        raise SystemExit(e.args[0])
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(rows.columns)
+    for row in rows:
+        writer.writerow(['' if row.get(c) is None else row.get(c) for c in rows.columns])
+    print(f'{len(rows)} linha(s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
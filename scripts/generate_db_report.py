@@ -4,8 +4,10 @@ from reportlab.lib.units import cm
 from datetime import datetime
 from pathlib import Path
 
+from dump_parser import open_dump, resolve_dump_path
+
 root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
-dump_path = root / 'db' / 'lovetofly-portal-full-dump.sql'
+dump_path = resolve_dump_path(root / 'db' / 'lovetofly-portal-full-dump.sql')
 out_path = root / 'db' / 'lovetofly-portal-db-report.pdf'
 
 if not dump_path.exists():
@@ -47,7 +49,7 @@ c.showPage()
 c.setFont(font_name, font_size)
 text = c.beginText(left_margin, page_height - top_margin)
 
-with dump_path.open('r', encoding='utf-8', errors='replace') as f:
+with open_dump(dump_path) as f:
     for raw_line in f:
         line = raw_line.rstrip('\n')
         # wrap long lines
@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+from index_advisor import find_index_advice
+
+root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
+dump_path = root / 'db' / 'lovetofly-portal-full-dump.sql'
+json_out_path = root / 'docs' / 'records' / 'active' / 'DB_INDEX_ADVISOR.json'
+md_out_path = root / 'docs' / 'records' / 'active' / 'DB_INDEX_ADVISOR.md'
+
+# Both reports are deterministic (no generation timestamp) so they can be
+# diffed across commits.
+
+KIND_LABELS = {'filter': 'filtro', 'join': 'junção', 'sort': 'ordenação'}
+
+
+def short(table: str) -> str:
+    return table[len('public.'):] if table.startswith('public.') else table
+
+
+def main():
+    advice = find_index_advice(root, dump_path)
+    unindexed = advice['unindexed']
+    unused = advice['unused_indexes']
+
+    json_out_path.write_text(json.dumps(advice, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+
+    lines = []
+    lines.append('# Assistente de Índices — Predicados do Código x Índices do Dump')
+    lines.append('')
+    lines.append(f'Dump: {dump_path.name}')
+    lines.append('')
+    lines.append(
+        'Critério: colunas usadas em WHERE/HAVING (filtro), JOIN ... ON (junção) e ORDER BY (ordenação) '
+        'nas consultas SQL de src/, comparadas com os índices, chaves primárias e restrições UNIQUE do dump. '
+        'Uma coluna é considerada coberta quando é a primeira coluna de algum índice. Peso = linhas da tabela '
+        'no dump × número de usos.'
+    )
+    lines.append('')
+    lines.append(f'- Colunas sem índice: {len(unindexed)}')
+    lines.append(f'- Índices não usados pelo código (exceto UNIQUE): {len(unused)}')
+    lines.append('')
+    lines.append('## Colunas sem índice')
+    lines.append('')
+    if unindexed:
+        lines.append('| Tabela | Coluna | Uso | Linhas | Usos | Peso |')
+        lines.append('| --- | --- | --- | ---: | ---: | ---: |')
+        for u in unindexed:
+            kinds = ', '.join(KIND_LABELS[k] for k in u['kinds'])
+            lines.append(f"| {short(u['table'])} | {u['column']} | {kinds} | {u['rows']} | {u['uses']} | {u['weight']} |")
+        lines.append('')
+        lines.append('### Onde são usadas')
+        for u in unindexed:
+            lines.append('')
+            lines.append(f"#### {short(u['table'])}.{u['column']}")
+            lines.append('')
+            for place in u['places']:
+                lines.append(f'- {place}')
+    else:
+        lines.append('Nenhuma.')
+    lines.append('')
+    lines.append('## Índices não usados pelo código')
+    lines.append('')
+    if unused:
+        lines.append('| Índice | Tabela | Colunas | Parcial | Linhas |')
+        lines.append('| --- | --- | --- | --- | ---: |')
+        for u in unused:
+            lines.append(
+                f"| {short(u['name'])} | {short(u['table'])} | {', '.join(u['columns'])} | "
+                f"{'sim' if u['partial'] else 'não'} | {u['rows']} |"
+            )
+    else:
+        lines.append('Nenhum.')
+    lines.append('')
+
+    md_out_path.write_text('\n'.join(lines), encoding='utf-8')
+    print(f'Wrote {json_out_path}')
+    print(f'Wrote {md_out_path}')
+
+
+if __name__ == '__main__':
+    main()
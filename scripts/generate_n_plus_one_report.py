@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+
+from n_plus_one import ANALYZED_ROOTS, find_n_plus_one
+
+root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
+json_out_path = root / 'docs' / 'records' / 'active' / 'API_N_PLUS_ONE_REPORT.json'
+md_out_path = root / 'docs' / 'records' / 'active' / 'API_N_PLUS_ONE_REPORT.md'
+
+# Both reports are deterministic (no generation timestamp) so they can be
+# diffed across commits.
+
+KIND_LABELS = {'query': 'consulta no loop', 'await': 'await no loop'}
+
+
+def short(table: str) -> str:
+    return table[len('public.'):] if table.startswith('public.') else table
+
+
+def main():
+    handlers = find_n_plus_one(root)
+
+    json_out_path.write_text(
+        json.dumps({'roots': list(ANALYZED_ROOTS), 'handlers': handlers}, indent=2, ensure_ascii=False) + '\n',
+        encoding='utf-8',
+    )
+
+    lines = []
+    lines.append('# Detector Estático de N+1 — Rotas de API e src/lib')
+    lines.append('')
+    lines.append(
+        'Critério: consultas SQL (ou chamadas .query/.execute) dentro de corpos de for/while/do e de '
+        'callbacks de forEach/map/flatMap, e await dentro de for/while/do. Handlers ordenados pelo número '
+        'de tabelas que tocam.'
+    )
+    lines.append('')
+    lines.append(f'- Handlers com ocorrências: {len(handlers)}')
+    lines.append(f"- Consultas em loop: {sum(1 for h in handlers for f in h['findings'] if f['kind'] == 'query')}")
+    lines.append(f"- Awaits em loop: {sum(1 for h in handlers for f in h['findings'] if f['kind'] == 'await')}")
+    lines.append('')
+    lines.append('| Handler | Rota | Tabelas | Tabelas consultadas em loop | Ocorrências |')
+    lines.append('| --- | --- | --- | --- | --- |')
+    for h in handlers:
+        lines.append(
+            f"| {h['file']}:{h['line']} {h['function']} | {h['route'] or '—'} | {len(h['tables'])} | "
+            f"{', '.join(short(t) for t in h['loop_tables']) or '—'} | {len(h['findings'])} |"
+        )
+    lines.append('')
+    lines.append('## Ocorrências')
+    for h in handlers:
+        lines.append('')
+        lines.append(f"### {h['file']} — {h['function']}")
+        lines.append('')
+        for f in h['findings']:
+            tables = f" ({', '.join(short(t) for t in f['tables'])})" if f['tables'] else ''
+            lines.append(f"- linha {f['line']}: {KIND_LABELS[f['kind']]} `{f['loop']}` (linha {f['loop_line']}){tables}")
+    lines.append('')
+
+    md_out_path.write_text('\n'.join(lines), encoding='utf-8')
+    print(f'Wrote {json_out_path}')
+    print(f'Wrote {md_out_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+from pathlib import Path
+from datetime import datetime
+
+from import_graph import find_route_table_reach
+from sql_extract import WRITE_KINDS
+
+root = Path('/Users/edsonassumpcao/Desktop/lovetofly-portal')
+out_path = root / 'docs' / 'records' / 'active' / 'API_ROUTE_TABLE_REACH.md'
+
+TOP_ROUTES = 15
+
+
+def short(table: str) -> str:
+    return table[len('public.'):] if table.startswith('public.') else table
+
+
+def main():
+    reach = find_route_table_reach(root)
+    ranked = sorted(reach.items(), key=lambda item: (-len(item[1]['tables']), item[0]))
+
+    lines = []
+    lines.append('# Alcance de Tabelas por Rota de API')
+    lines.append('')
+    lines.append(f'Gerado em: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+    lines.append('')
+    lines.append(
+        'Critério: tabelas das instruções SQL do route.ts e de todos os módulos que ele importa '
+        '(direta ou transitivamente, incluindo aliases @/ do tsconfig.json).'
+    )
+    lines.append('')
+    with_tables = sum(1 for _, info in ranked if info['tables'])
+    indirect_only = sum(1 for _, info in ranked if info['tables'] and not info['direct'])
+    lines.append(f'- Rotas analisadas: {len(ranked)}')
+    lines.append(f'- Rotas que tocam tabelas: {with_tables}')
+    lines.append(f'- Rotas que só tocam tabelas via imports: {indirect_only}')
+    lines.append('')
+    lines.append(f'## Rotas que tocam mais tabelas (top {TOP_ROUTES})')
+    lines.append('')
+    lines.append('| Rota | Tabelas | Escrita | Via imports | Arquivos com SQL |')
+    lines.append('| --- | --- | --- | --- | --- |')
+    for route, info in ranked[:TOP_ROUTES]:
+        if not info['tables']:
+            break
+        writes = [t for t, kinds in info['tables'].items() if any(k in WRITE_KINDS for k in kinds)]
+        indirect = [t for t in info['tables'] if t not in info['direct']]
+        lines.append(
+            f"| {route} | {len(info['tables'])} | {len(writes)} | {len(indirect)} | {len(info['files'])} |"
+        )
+    lines.append('')
+    lines.append('## Todas as rotas')
+    lines.append('')
+    lines.append('| Rota | Tabelas (leitura) | Tabelas (escrita) | Arquivos com SQL |')
+    lines.append('| --- | --- | --- | --- |')
+    for route, info in ranked:
+        reads = [short(t) for t, kinds in info['tables'].items() if not any(k in WRITE_KINDS for k in kinds)]
+        writes = [short(t) for t, kinds in info['tables'].items() if any(k in WRITE_KINDS for k in kinds)]
+        lines.append(
+            f"| {route} | {', '.join(reads) or '—'} | {', '.join(writes) or '—'} | "
+            f"{', '.join(info['files']) or '—'} |"
+        )
+    lines.append('')
+
+    out_path.write_text('\n'.join(lines), encoding='utf-8')
+    print(f'Wrote {out_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from collections import defaultdict, deque
+
+from code_usage import iter_code_paths, load_code_index
+from worker_pool import map_tasks
+
+# Import graph of the TS/JS sources under src/: which project files each
+# file imports, following relative specifiers and the tsconfig.json "paths"
+# aliases (@/* -> ./src/*). The raw specifiers of every file are kept in
+# db/import-graph.index.json keyed by size, mtime and sha256, so a run only
+# re-reads changed files; resolution against the current file set is
+# redone on each load. Combined with the SQL references of the code-usage
+# index, this gives the tables an API route reaches through the helpers it
+# imports, not only the ones named in the route file itself.
+
+GRAPH_VERSION = 1
+RESOLVE_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx', '.mjs')
+IMPORT_RE = re.compile(
+    r"""
+    (?:\bimport\s+(?:[\w*{}$,\s]+?\s+from\s+)?   # import x from '...', import '...'
+      |\bexport\s+[\w*{}$,\s]+?\s+from\s+         # export { x } from '...'
+      |\bimport\s*\(\s*                           # import('...')
+      |\brequire\s*\(\s*                          # require('...')
+    )(['"])([^'"\n]+)\1
+    """,
+    re.X,
+)
+ROUTE_FILE_RE = re.compile(r'^src/app/api/(?:.*/)?route\.(?:ts|tsx|js)$')
+ROUTE_GROUP_RE = re.compile(r'/\([^/)]*\)')
+
+
+def read_import_specifiers(text: str):
+    return list(dict.fromkeys(m.group(2) for m in IMPORT_RE.finditer(text)))
+
+
+def load_tsconfig_paths(root: Path):
+    # [(alias prefix, alias suffix, [target patterns relative to root])]
+    # from compilerOptions.paths; a "*" in the alias is the wildcard.
+    path = root / 'tsconfig.json'
+    if not path.exists():
+        return []
+    text = path.read_text(encoding='utf-8')
+    try:
+        config = json.loads(text)
+    except ValueError:
+        # tsconfig allows comments and trailing commas.
+        text = re.sub(r'("(?:[^"\\]|\\.)*")|//[^\n]*|/\*.*?\*/', lambda m: m.group(1) or '', text, flags=re.S)
+        config = json.loads(re.sub(r',(\s*[}\]])', r'\1', text))
+    options = config.get('compilerOptions') or {}
+    base = os.path.normpath(options.get('baseUrl') or '.')
+    aliases = []
+    for alias, targets in (options.get('paths') or {}).items():
+        prefix, _, suffix = alias.partition('*')
+        aliases.append((prefix, suffix, [os.path.normpath(os.path.join(base, t)) for t in targets]))
+    # Longest prefix first, as TypeScript picks the most specific pattern.
+    return sorted(aliases, key=lambda a: -len(a[0]))
+
+
+def parse_imports_file(task):
+    # Graph entry for one file; 'imports' is None when the content hash still
+    # matches `known_sha256` (only the mtime moved). None if unreadable.
+    path, known_sha256 = task
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    except Exception:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest, 'imports': None}
+    if digest != known_sha256:
+        entry['imports'] = read_import_specifiers(data.decode('utf-8', errors='ignore'))
+    return entry
+
+
+class ImportGraph:
+
+    def __init__(self, root: Path, path: Path = None):
+        self.root = root
+        self.path = path or root / 'db' / 'import-graph.index.json'
+        self.files = {}
+        self.edges = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = None
+            if data and data.get('version') == GRAPH_VERSION:
+                self.files = data['files']
+
+    def update(self, search_roots=None, workers=None):
+        # Re-reads new or changed files (in a process pool), drops removed
+        # ones and resolves every file's imports against the current tree.
+        search_roots = [self.root / 'src'] if search_roots is None else search_roots
+        listed = []
+        pending = []
+        for path in iter_code_paths(self.root, search_roots):
+            if path.suffix == '.sql':
+                continue
+            rel = path.relative_to(self.root).as_posix()
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            listed.append(rel)
+            entry = self.files.get(rel)
+            if not (entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns):
+                pending.append((str(path), entry['sha256'] if entry else None))
+        for (path, _), result in zip(pending, map_tasks(parse_imports_file, pending, workers)):
+            rel = Path(path).relative_to(self.root).as_posix()
+            if result is None:
+                self.files.pop(rel, None)
+            elif result['imports'] is None:
+                self.files[rel]['mtime_ns'] = result['mtime_ns']
+            else:
+                self.files[rel] = result
+            self.dirty = True
+        seen = set(listed)
+        for rel in [rel for rel in self.files if rel not in seen]:
+            del self.files[rel]
+            self.dirty = True
+        self.resolve_all()
+
+    def resolve_all(self):
+        aliases = load_tsconfig_paths(self.root)
+        known = set(self.files)
+        self.edges = {}
+        for rel, entry in self.files.items():
+            targets = (resolve_import(rel, spec, aliases, known) for spec in entry['imports'])
+            self.edges[rel] = list(dict.fromkeys(t for t in targets if t and t != rel))
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': GRAPH_VERSION, 'files': self.files}), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def reachable(self, rel):
+        # Files reachable from `rel` through imports, `rel` included, in
+        # breadth-first order.
+        seen = {rel: None}
+        queue = deque([rel])
+        while queue:
+            for nxt in self.edges.get(queue.popleft(), ()):
+                if nxt not in seen:
+                    seen[nxt] = None
+                    queue.append(nxt)
+        return list(seen)
+
+
+def resolve_import(importer: str, spec: str, aliases, known):
+    # Project file (relative to the root) that `spec` imported from
+    # `importer` refers to, or None for packages and unresolved paths.
+    if spec.startswith('.'):
+        candidates = [os.path.normpath(os.path.join(os.path.dirname(importer), spec))]
+    else:
+        candidates = []
+        for prefix, suffix, targets in aliases:
+            if spec.startswith(prefix) and spec.endswith(suffix) and len(spec) >= len(prefix) + len(suffix):
+                middle = spec[len(prefix):len(spec) - len(suffix)]
+                candidates = [t.replace('*', middle, 1) for t in targets]
+                break
+    for candidate in candidates:
+        candidate = candidate.replace(os.sep, '/')
+        if candidate in known:
+            return candidate
+        for ext in RESOLVE_EXTENSIONS:
+            if candidate + ext in known:
+                return candidate + ext
+        for ext in RESOLVE_EXTENSIONS:
+            if f'{candidate}/index{ext}' in known:
+                return f'{candidate}/index{ext}'
+    return None
+
+
+def load_import_graph(root: Path, search_roots=None, workers=None):
+    graph = ImportGraph(root)
+    graph.update(search_roots, workers)
+    graph.save()
+    return graph
+
+
+def route_path(rel: str) -> str:
+    # src/app/api/(group)/foo/[id]/route.ts -> /api/foo/[id]
+    route = '/' + rel[len('src/app/'):].rsplit('/', 1)[0]
+    return ROUTE_GROUP_RE.sub('', route) or '/'
+
+
+def find_route_table_reach(root: Path, workers=None):
+    # {route: {'file', 'tables': {table: [kinds]}, 'direct': [tables],
+    # 'files': [reachable files with SQL]}} for every API route handler;
+    # tables come from the SQL statements of the route file and of every
+    # file it imports, directly or transitively.
+    graph = load_import_graph(root, workers=workers)
+    index, _ = load_code_index(root, [], [root / 'src'], workers)
+    direct = {}
+    for rel, entry in index.files.items():
+        rel = Path(rel).as_posix()
+        kinds = defaultdict(set)
+        for _, table, kind in entry['sql']:
+            kinds[table].add(kind)
+        if kinds:
+            direct[rel] = kinds
+    reach = {}
+    for rel in sorted(graph.files):
+        if not ROUTE_FILE_RE.match(rel):
+            continue
+        tables = defaultdict(set)
+        sources = []
+        for dep in graph.reachable(rel):
+            if dep in direct:
+                sources.append(dep)
+                for table, kinds in direct[dep].items():
+                    tables[table].update(kinds)
+        reach[route_path(rel)] = {
+            'file': rel,
+            'tables': {t: sorted(tables[t]) for t in sorted(tables)},
+            'direct': sorted(direct.get(rel, ())),
+            'files': sources,
+        }
+    return reach
@@ -0,0 +1,200 @@
+from pathlib import Path
+from collections import defaultdict
+
+from code_usage import iter_code_paths
+from worker_pool import map_tasks
+from dump_snapshot import count_rows_cached
+from schema_model import schema_from_dump
+from sql_extract import RESERVED, SKIPPED_BEFORE_TABLE, iter_statement_tokens, keyword, normalize_table_name, read_name
+
+# Index advisor: the columns the source's SQL filters, joins and sorts on,
+# checked against the indexes (and primary key / unique constraints) of the
+# dump. An index supports a column when the column leads it. Predicates
+# without a supporting index are weighted by the table's row count in the
+# dump times the number of statements using them; dump indexes whose
+# leading column no statement uses are listed as unused (unique ones are
+# left out, they enforce constraints).
+
+# Clause keywords and the usage kind of the columns they contain.
+CLAUSE_KINDS = {'WHERE': 'filter', 'HAVING': 'filter', 'ON': 'join', 'ORDER': 'sort'}
+CLAUSE_WORDS = {
+    'SELECT', 'FROM', 'JOIN', 'WHERE', 'HAVING', 'ON', 'ORDER', 'GROUP', 'LIMIT', 'OFFSET', 'SET', 'VALUES',
+    'RETURNING', 'UNION', 'EXCEPT', 'INTERSECT', 'USING', 'WINDOW', 'INTO', 'UPDATE', 'DELETE', 'INSERT',
+    'CONFLICT', 'DO',
+}
+TABLE_CLAUSES = {'FROM', 'JOIN', 'UPDATE', 'INTO', 'USING'}
+NOT_COLUMNS = RESERVED | {
+    'ASC', 'DESC', 'NULLS', 'FIRST', 'LAST', 'LIKE', 'ILIKE', 'BETWEEN', 'TRUE', 'FALSE', 'INTERVAL', 'ANY',
+    'SOME', 'CURRENT_DATE', 'CURRENT_TIMESTAMP', 'NOW', 'COALESCE', 'LOWER', 'UPPER', 'DATE', 'TIMESTAMP',
+    'TEXT', 'INTEGER', 'INT', 'UUID', 'JSONB', 'BOOLEAN', 'NUMERIC', 'VARCHAR',
+}
+
+
+def statement_aliases(tokens):
+    # {alias or table name: table} for the tables a statement reads or writes.
+    aliases = {}
+    expect = None          # clause keyword a table name is expected after
+    in_list = False        # inside a FROM a, b list
+    i = 0
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+        kw = keyword(token)
+        if expect and kw in SKIPPED_BEFORE_TABLE:
+            i += 1
+            continue
+        if expect and token[0] in ('ident', 'qident') and kw not in RESERVED:
+            name, j = read_name(tokens, i)
+            clause, expect = expect, None
+            if j < n and tokens[j][1] == '(' and clause != 'INTO':
+                i = j  # set-returning function, not a table
+                continue
+            table = normalize_table_name(name)
+            aliases[name.split('.')[-1].strip('"').lower()] = table
+            if j < n and keyword(tokens[j]) == 'AS':
+                j += 1
+            if j < n and tokens[j][0] in ('ident', 'qident') and keyword(tokens[j]) not in CLAUSE_WORDS | RESERVED:
+                aliases[tokens[j][1].strip('"').lower()] = table
+                j += 1
+            in_list = clause == 'FROM'
+            i = j
+            continue
+        if in_list and token[1] == ',':
+            expect = 'FROM'
+        else:
+            in_list = False
+            expect = kw if kw in TABLE_CLAUSES else None
+        i += 1
+    return aliases
+
+
+def statement_columns(tokens, aliases, columns_of):
+    # [(table, column, kind, offset)] for the columns used in WHERE/HAVING
+    # (filter), JOIN ... ON (join) and ORDER BY (sort). Bare columns are
+    # resolved to the one statement table that has them.
+    tables = set(aliases.values())
+    uses = []
+    clause = None
+    stack = []
+    i = 0
+    n = len(tokens)
+    while i < n:
+        kind, text, offset = tokens[i]
+        kw = keyword(tokens[i])
+        if kind == 'op' and text == '(':
+            stack.append(clause)
+            i += 1
+            continue
+        if kind == 'op' and text == ')':
+            clause = stack.pop() if stack else clause
+            i += 1
+            continue
+        if kw in CLAUSE_WORDS:
+            clause = kw
+            i += 1
+            continue
+        usage = CLAUSE_KINDS.get(clause)
+        if usage and kind in ('ident', 'qident') and kw not in NOT_COLUMNS:
+            name, j = read_name(tokens, i)
+            if j < n and tokens[j][1] == '(':
+                i += 1  # function call
+                continue
+            parts = [p.strip('"').lower() for p in name.split('.')]
+            table = None
+            if len(parts) >= 2:
+                table = aliases.get(parts[-2])
+            else:
+                owners = [t for t in tables if parts[-1] in columns_of.get(t, ())]
+                table = owners[0] if len(owners) == 1 else None
+            if table and parts[-1] in columns_of.get(table, ()):
+                uses.append((table, parts[-1], usage, offset))
+            i = j
+            continue
+        i += 1
+    return uses
+
+
+_worker_state = {}
+
+
+def init_advisor_worker(columns_of):
+    _worker_state['columns_of'] = columns_of
+
+
+def scan_predicates(task):
+    # [(table, column, kind, line)] for one source file.
+    path, suffix = task
+    try:
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf-8', errors='ignore')
+    except Exception:
+        return []
+    columns_of = _worker_state['columns_of']
+    uses = []
+    for _, tokens, line_of in iter_statement_tokens(text, suffix):
+        aliases = statement_aliases(tokens)
+        for table, column, usage, offset in statement_columns(tokens, aliases, columns_of):
+            uses.append((table, column, usage, line_of(offset)))
+    return uses
+
+
+def find_index_advice(root: Path, dump_path: Path, search_roots=None, workers=None):
+    # {'unindexed': [...], 'unused_indexes': [...]} for the SQL in the
+    # sources under `search_roots` (default: src/) against the dump.
+    search_roots = [root / 'src'] if search_roots is None else search_roots
+    model = schema_from_dump(dump_path)
+    _, counts = count_rows_cached(dump_path)
+    rows = {normalize_table_name(t): total for t, total in counts.items()}
+    columns_of = {t: list(entry['columns']) for t, entry in model.tables.items()}
+
+    leading = defaultdict(list)       # (table, column) -> [index names]
+    for name, index in model.indexes.items():
+        if index['columns']:
+            leading[(index['table'], index['columns'][0])].append(name)
+    for table, entry in model.tables.items():
+        for name, constraint in entry['constraints'].items():
+            if constraint['type'] in ('primary key', 'unique') and constraint['columns']:
+                leading[(table, constraint['columns'][0])].append(name)
+
+    paths = [p for p in iter_code_paths(root, search_roots)]
+    tasks = [(str(p), p.suffix) for p in paths]
+    uses = defaultdict(lambda: {'kinds': set(), 'places': []})
+    for path, found in zip(paths, map_tasks(scan_predicates, tasks, workers, init_advisor_worker, (columns_of,))):
+        rel = path.relative_to(root).as_posix()
+        for table, column, usage, line in found:
+            entry = uses[(table, column)]
+            entry['kinds'].add(usage)
+            place = f'{rel}:{line}'
+            if place not in entry['places']:
+                entry['places'].append(place)
+
+    unindexed = []
+    for (table, column), entry in uses.items():
+        if leading.get((table, column)) or not rows.get(table):
+            continue
+        unindexed.append({
+            'table': table,
+            'column': column,
+            'kinds': sorted(entry['kinds']),
+            'rows': rows[table],
+            'uses': len(entry['places']),
+            'weight': rows[table] * len(entry['places']),
+            'places': entry['places'],
+        })
+    unindexed.sort(key=lambda u: (-u['weight'], u['table'], u['column']))
+
+    unused = []
+    for name, index in sorted(model.indexes.items()):
+        if index['unique'] or not index['columns'] or index['table'] not in columns_of:
+            continue
+        if (index['table'], index['columns'][0]) in uses:
+            continue
+        unused.append({
+            'name': name,
+            'table': index['table'],
+            'columns': index['columns'],
+            'partial': index['partial'],
+            'rows': rows.get(index['table'], 0),
+        })
+    unused.sort(key=lambda u: (-u['rows'], u['table'], u['name']))
+    return {'unindexed': unindexed, 'unused_indexes': unused}
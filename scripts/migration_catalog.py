@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from collections import defaultdict
+from bisect import bisect_right
+
+from worker_pool import map_tasks
+from sql_extract import iter_js_strings, keyword, normalize_table_name, read_name, split_statements, tokenize_sql
+
+# Catalog of what every migration under src/migrations does to each table:
+# created, altered, indexed or dropped. Each file is parsed once (SQL
+# statements, DDL inside DO blocks, and the up() step of node-pg-migrate
+# .js files), migrations are ordered by their numeric prefix, and the
+# per-file results are kept in db/migration-catalog.index.json keyed by the
+# file's size, mtime and sha256, so only changed migrations are re-parsed.
+# Table lookups go through a table -> [(migration, action, line)] map.
+
+MIGRATION_EXTENSIONS = ('.sql', '.js')
+ACTIONS = ('create', 'alter', 'index', 'drop')
+CATALOG_VERSION = 1
+
+DDL_VERBS = {'CREATE', 'ALTER', 'DROP'}
+# Keywords after which a DDL statement can start inside a PL/pgSQL body.
+BLOCK_STARTS = {None, 'BEGIN', 'THEN', 'ELSE', 'LOOP'}
+CREATE_MODIFIERS = {'OR', 'REPLACE', 'UNIQUE', 'TEMP', 'TEMPORARY', 'UNLOGGED', 'GLOBAL', 'LOCAL'}
+NAME_PREFIXES = {'IF', 'NOT', 'EXISTS', 'ONLY', 'CONCURRENTLY'}
+
+PGM_CALL_RE = re.compile(r'\bpgm\.(\w+)\(\s*')
+PGM_NAME_RE = re.compile(r"""(['"`])([^'"`]+)\1""")
+PGM_ACTIONS = {
+    'createTable': 'create',
+    'dropTable': 'drop',
+    'createIndex': 'index',
+    'addIndex': 'index',
+    'alterTable': 'alter',
+    'addColumns': 'alter',
+    'addColumn': 'alter',
+    'dropColumns': 'alter',
+    'dropColumn': 'alter',
+    'alterColumn': 'alter',
+    'renameColumn': 'alter',
+    'addConstraint': 'alter',
+    'dropConstraint': 'alter',
+    'createConstraint': 'alter',
+}
+JS_DOWN_RE = re.compile(r'\bexport\s+const\s+down\b|\bexports\.down\b')
+
+
+def migration_number(name: str):
+    m = re.match(r'\d+', name)
+    return int(m.group()) if m else float('inf')
+
+
+def iter_migration_paths(root: Path):
+    # Migration files in the order they are applied: numeric prefix first,
+    # then file name.
+    base = root / 'src' / 'migrations'
+    if not base.is_dir():
+        return []
+    paths = [p for p in base.iterdir() if p.is_file() and p.suffix in MIGRATION_EXTENSIONS]
+    return sorted(paths, key=lambda p: (migration_number(p.name), p.name))
+
+
+def iter_ddl_statements(sql: str, base: int = 0):
+    # Token lists of the CREATE/ALTER/DROP statements in `sql`, including the
+    # ones inside DO $$ ... $$ blocks, with offsets shifted by `base`.
+    for tokens in split_statements(tokenize_sql(sql)):
+        if keyword(tokens[0]) == 'DO':
+            for kind, text, offset in tokens[1:]:
+                if kind == 'dollar':
+                    body_start = text.index('$', 1) + 1
+                    yield from iter_ddl_statements(text[body_start:text.rindex('$', 0, -1)], base + offset + body_start)
+            continue
+        prev = None
+        for i, token in enumerate(tokens):
+            kw = keyword(token)
+            if kw in DDL_VERBS and prev in BLOCK_STARTS:
+                yield [(kind, text, offset + base) for kind, text, offset in tokens[i:]]
+                break
+            prev = kw or token[1]
+
+
+def skip_keywords(tokens, i, words):
+    while i < len(tokens) and keyword(tokens[i]) in words:
+        i += 1
+    return i
+
+
+def statement_actions(tokens):
+    # [(table, action, offset)] for one DDL statement.
+    verb = keyword(tokens[0])
+    i = 1
+    if verb == 'CREATE':
+        i = skip_keywords(tokens, i, CREATE_MODIFIERS)
+        target = keyword(tokens[i]) if i < len(tokens) else None
+        if target == 'TABLE':
+            name, _ = read_name(tokens, skip_keywords(tokens, i + 1, NAME_PREFIXES))
+            return [(normalize_table_name(name), 'create', tokens[0][2])] if name else []
+        if target == 'INDEX':
+            for j in range(i + 1, len(tokens)):
+                if keyword(tokens[j]) == 'ON':
+                    name, _ = read_name(tokens, skip_keywords(tokens, j + 1, NAME_PREFIXES))
+                    return [(normalize_table_name(name), 'index', tokens[0][2])] if name else []
+        return []
+    target = keyword(tokens[i]) if i < len(tokens) else None
+    if target != 'TABLE':
+        return []
+    i = skip_keywords(tokens, i + 1, NAME_PREFIXES)
+    if verb == 'ALTER':
+        name, _ = read_name(tokens, i)
+        return [(normalize_table_name(name), 'alter', tokens[0][2])] if name else []
+    actions = []
+    while i < len(tokens):
+        name, i = read_name(tokens, i)
+        if not name:
+            break
+        actions.append((normalize_table_name(name), 'drop', tokens[0][2]))
+        if i < len(tokens) and tokens[i][1] == ',':
+            i += 1
+        else:
+            break
+    return actions
+
+
+def sql_actions(sql: str, base: int = 0):
+    return [action for tokens in iter_ddl_statements(sql, base) for action in statement_actions(tokens)]
+
+
+def js_actions(text: str):
+    # Actions of the up() step of a node-pg-migrate migration; down() undoes
+    # them and is left out.
+    down = JS_DOWN_RE.search(text)
+    end = down.start() if down else len(text)
+    actions = []
+    for m in PGM_CALL_RE.finditer(text, 0, end):
+        method = m.group(1)
+        if method == 'sql':
+            for offset, sql in iter_js_strings(text, m.end(), end):
+                actions.extend(sql_actions(sql, offset + 1))
+                break
+        elif method in PGM_ACTIONS:
+            nm = PGM_NAME_RE.match(text, m.end())
+            if nm:
+                actions.append((normalize_table_name(nm.group(2)), PGM_ACTIONS[method], m.start()))
+    return actions
+
+
+def parse_migration(text: str, suffix: str):
+    # [[table, action, line]] in file order.
+    actions = js_actions(text) if suffix == '.js' else sql_actions(text)
+    newlines = [m.start() for m in re.finditer('\n', text)]
+    return [[table, action, bisect_right(newlines, offset) + 1] for table, action, offset in actions]
+
+
+def parse_migration_file(task):
+    # Catalog entry for one migration file; 'actions' is None when the
+    # content hash still matches `known_sha256` (only the mtime moved).
+    # None if the file cannot be read.
+    path, known_sha256 = task
+    try:
+        st = os.stat(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+    except Exception:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest, 'actions': None}
+    if digest != known_sha256:
+        entry['actions'] = parse_migration(data.decode('utf-8', errors='ignore'), os.path.splitext(path)[1])
+    return entry
+
+
+class MigrationCatalog:
+
+    def __init__(self, root: Path, path: Path = None):
+        self.root = root
+        self.path = path or root / 'db' / 'migration-catalog.index.json'
+        self.files = {}
+        self.migrations = []
+        self.by_table = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except ValueError:
+                data = None
+            if data and data.get('version') == CATALOG_VERSION:
+                self.files = data['files']
+
+    def update(self, workers=None):
+        # Re-parses new or changed migrations (in a process pool), drops the
+        # removed ones and rebuilds the ordered list and the table map.
+        paths = iter_migration_paths(self.root)
+        pending = []
+        for path in paths:
+            entry = self.files.get(path.name)
+            st = path.stat()
+            if not (entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns):
+                pending.append((str(path), entry['sha256'] if entry else None))
+        for (path, _), result in zip(pending, map_tasks(parse_migration_file, pending, workers)):
+            name = os.path.basename(path)
+            if result is None:
+                self.files.pop(name, None)
+            elif result['actions'] is None:
+                self.files[name]['mtime_ns'] = result['mtime_ns']
+            else:
+                self.files[name] = result
+            self.dirty = True
+        listed = {p.name for p in paths}
+        for name in [name for name in self.files if name not in listed]:
+            del self.files[name]
+            self.dirty = True
+        self.migrations = [p.name for p in paths if p.name in self.files]
+        by_table = defaultdict(list)
+        for name in self.migrations:
+            for table, action, line in self.files[name]['actions']:
+                by_table[table].append((name, action, line))
+        self.by_table = dict(by_table)
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path.with_name(self.path.name + f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({'version': CATALOG_VERSION, 'files': self.files}), encoding='utf-8')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def actions_for(self, table_name):
+        # [(migration, action, line)] for a table, in migration order.
+        return self.by_table.get(normalize_table_name(table_name), [])
+
+    def migrations_for(self, table_name, actions=ACTIONS):
+        # Migrations that apply any of `actions` to a table, each listed once.
+        return list(dict.fromkeys(name for name, action, _ in self.actions_for(table_name) if action in actions))
+
+
+def load_migration_catalog(root: Path, workers=None):
+    catalog = MigrationCatalog(root)
+    catalog.update(workers)
+    catalog.save()
+    return catalog
+
+
+def find_migration_sources(root: Path, table_names, workers=None):
+    # Maps each table name to the migration files that create it, in the
+    # order they are applied. Names are compared as PostgreSQL resolves
+    # them, so "public.users" matches "CREATE TABLE IF NOT EXISTS users".
+    catalog = load_migration_catalog(root, workers)
+    migrations = {}
+    for name in table_names:
+        created_in = catalog.migrations_for(name, ('create',))
+        if created_in:
+            migrations[name] = created_in
+    return migrations
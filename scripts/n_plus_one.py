@@ -0,0 +1,244 @@
+import re
+from pathlib import Path
+from bisect import bisect_right
+from collections import defaultdict
+
+from code_usage import iter_code_paths, load_code_index
+from import_graph import ROUTE_FILE_RE, route_path
+from sql_extract import JS_START_RE, JS_STRING_RE, read_template
+
+# Static N+1 detector for the API route handlers and src/lib. Loop bodies
+# (for/while/do, and the callbacks of forEach/map/flatMap) are located on a
+# copy of the source whose strings, templates and comments are blanked out,
+# so braces inside SQL or text never confuse the matching. A finding is a
+# SQL statement (from the code-usage index, the same scan find_read_write
+# uses) or a .query()/.execute() call inside a loop body, or an await inside
+# a for/while/do body, which serializes one round trip per iteration.
+
+ANALYZED_ROOTS = ('src/app/api', 'src/lib')
+LOOP_RE = re.compile(r'\b(for)\s*(?:await\s*)?\(|\b(while)\s*\(|\b(do)\s*\{|\.(forEach|map|flatMap)\s*\(')
+SEQUENTIAL_LOOPS = ('for', 'while', 'do')
+QUERY_CALL_RE = re.compile(r'\.(?:query|execute)\s*(?:<[^>()]*>\s*)?\(|\bsql\s*`')
+AWAIT_RE = re.compile(r'\bawait\b')
+DECLARATION_RE = re.compile(
+    r'(?:function\s*\*?\s*([A-Za-z_$][\w$]*)|(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=|class\s+([A-Za-z_$][\w$]*))'
+)
+BLANK_RE = re.compile(r'[^\n]')
+
+
+def blank(segment: str) -> str:
+    return BLANK_RE.sub(' ', segment)
+
+
+def mask_js(text: str) -> str:
+    # `text` with the contents of strings, template literals and comments
+    # replaced by spaces (newlines kept), so offsets and lines still match.
+    out = []
+    pos = 0
+    n = len(text)
+    while pos < n:
+        m = JS_START_RE.search(text, pos)
+        if not m:
+            break
+        tok = m.group()
+        out.append(text[pos:m.start()])
+        if tok == '//':
+            nl = text.find('\n', m.end())
+            end = n if nl < 0 else nl
+            out.append(blank(text[m.start():end]))
+        elif tok == '/*':
+            close = text.find('*/', m.end())
+            end = n if close < 0 else close + 2
+            out.append(blank(text[m.start():end]))
+        elif tok == '`':
+            _, end, _ = read_template(text, m.end(), n)
+            closed = end > m.end() and text[end - 1] == '`'
+            out.append('`' + blank(text[m.end():end - 1 if closed else end]) + ('`' if closed else ''))
+        else:
+            sm = JS_STRING_RE[tok].match(text, m.start())
+            end = sm.end() if sm else m.end()
+            out.append(tok + blank(text[m.start() + 1:end - 1]) + tok if sm else tok)
+        pos = end
+    out.append(text[pos:])
+    return ''.join(out)
+
+
+def matching(code: str, i: int) -> int:
+    # Offset just past the bracket closing the one at code[i].
+    pairs = {'(': ')', '{': '}', '[': ']'}
+    stack = []
+    for j in range(i, len(code)):
+        c = code[j]
+        if c in pairs:
+            stack.append(pairs[c])
+        elif stack and c == stack[-1]:
+            stack.pop()
+            if not stack:
+                return j + 1
+    return len(code)
+
+
+def loop_spans(code: str):
+    # [(kind, start, body_start, body_end)] for every loop in masked code.
+    spans = []
+    for m in LOOP_RE.finditer(code):
+        kind = next(g for g in m.groups() if g)
+        if kind == 'do':
+            brace = m.end() - 1
+            spans.append((kind, m.start(), brace, matching(code, brace)))
+            continue
+        paren = m.end() - 1
+        close = matching(code, paren)
+        if kind not in SEQUENTIAL_LOOPS:
+            spans.append((kind, m.start(), paren, close))
+            continue
+        k = close
+        while k < len(code) and code[k].isspace():
+            k += 1
+        if k < len(code) and code[k] == '{':
+            spans.append((kind, m.start(), k, matching(code, k)))
+        else:
+            semi = code.find(';', k)
+            spans.append((kind, m.start(), k, len(code) if semi < 0 else semi + 1))
+    return spans
+
+
+def top_level_functions(code: str):
+    # [(name, start, end)] of the top-level blocks ({...} at depth 0) with
+    # the name of the declaration they belong to.
+    functions = []
+    depth = 0
+    statement_start = 0
+    i = 0
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if c == '{' and depth == 0:
+            end = matching(code, i)
+            m = DECLARATION_RE.search(code, statement_start, i)
+            if m:
+                functions.append((next(g for g in m.groups() if g), m.start(), end))
+            else:
+                functions.append(('(anônima)', statement_start, end))
+            i = statement_start = end
+            continue
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth = max(0, depth - 1)
+        elif c == ';' and depth == 0:
+            statement_start = i + 1
+        i += 1
+    return functions
+
+
+def analyze_source(rel: str, text: str, sql_refs):
+    # (findings, functions) for one file. `sql_refs` are the file's
+    # [line, table, kind] entries from the code-usage index.
+    code = mask_js(text)
+    newlines = [m.start() for m in re.finditer('\n', text)]
+
+    def line_of(offset):
+        return bisect_right(newlines, offset) + 1
+
+    tables_by_line = defaultdict(set)
+    for line, table, _ in sql_refs:
+        tables_by_line[line].add(table)
+    functions = top_level_functions(code)
+
+    def function_of(offset):
+        for name, start, end in functions:
+            if start <= offset < end:
+                return name
+        return '(módulo)'
+
+    loops = loop_spans(code)
+    findings = {}
+    for kind, start, body_start, body_end in loops:
+        first, last = line_of(body_start), line_of(body_end - 1)
+        hits = {}
+        covered = set()
+        # A query call takes the tables of the SQL lines it spans.
+        for m in QUERY_CALL_RE.finditer(code, body_start, body_end):
+            if m.group().endswith('('):
+                call_end = matching(code, m.end() - 1)
+            else:
+                close = code.find('`', m.end())
+                call_end = len(code) if close < 0 else close + 1
+            line, end_line = line_of(m.start()), line_of(call_end - 1)
+            span = range(line, end_line + 1)
+            covered.update(span)
+            hits[line] = ('query', sorted({t for l in span for t in tables_by_line.get(l, ())}))
+        # SQL outside any call in the loop (built into a variable first):
+        # one finding per run of consecutive SQL lines.
+        run = None
+        for line in range(first, last + 1):
+            if line in covered or not tables_by_line.get(line):
+                run = None
+                continue
+            if run is None or line != run[1] + 1:
+                run = [line, line]
+                hits[line] = ('query', set())
+            run[1] = line
+            hits[run[0]][1].update(tables_by_line[line])
+        hits = {line: (what, sorted(tables)) for line, (what, tables) in hits.items()}
+        if kind in SEQUENTIAL_LOOPS:
+            for m in AWAIT_RE.finditer(code, body_start, body_end):
+                line = line_of(m.start())
+                if line not in hits and line not in covered:
+                    hits[line] = ('await', [])
+        for line, (what, tables) in hits.items():
+            # Nested loops report a hit once, against the innermost loop.
+            previous = findings.get(line)
+            if previous and previous['loop_line'] >= line_of(start):
+                continue
+            findings[line] = {
+                'file': rel,
+                'function': function_of(body_start),
+                'line': line,
+                'kind': what,
+                'loop': kind,
+                'loop_line': line_of(start),
+                'tables': tables,
+            }
+    handlers = []
+    for name, start, end in functions:
+        first, last = line_of(start), line_of(end - 1)
+        tables = sorted({t for line in range(first, last + 1) for t in tables_by_line.get(line, ())})
+        handlers.append({'file': rel, 'function': name, 'first_line': first, 'last_line': last, 'tables': tables})
+    return [findings[line] for line in sorted(findings)], handlers
+
+
+def find_n_plus_one(root: Path, workers=None):
+    # Handlers with queries or awaits inside loops, ranked by how many
+    # tables they touch: [{'file', 'route', 'function', 'tables',
+    # 'loop_tables', 'findings': [...]}].
+    roots = [root / r for r in ANALYZED_ROOTS]
+    index, _ = load_code_index(root, [], roots, workers)
+    results = []
+    for path in iter_code_paths(root, roots):
+        rel = path.relative_to(root).as_posix()
+        if path.suffix == '.sql' or (rel.startswith('src/app/api/') and not ROUTE_FILE_RE.match(rel)):
+            continue
+        try:
+            text = path.read_text(encoding='utf-8', errors='ignore')
+        except OSError:
+            continue
+        entry = index.files.get(str(path.relative_to(root)))
+        findings, handlers = analyze_source(rel, text, entry['sql'] if entry else [])
+        for handler in handlers:
+            hits = [f for f in findings if f['function'] == handler['function']
+                    and handler['first_line'] <= f['line'] <= handler['last_line']]
+            if not hits:
+                continue
+            results.append({
+                'file': rel,
+                'route': route_path(rel) if ROUTE_FILE_RE.match(rel) else None,
+                'function': handler['function'],
+                'line': handler['first_line'],
+                'tables': handler['tables'],
+                'loop_tables': sorted({t for f in hits for t in f['tables']}),
+                'findings': hits,
+            })
+    results.sort(key=lambda r: (-len(r['tables']), -len(r['loop_tables']), -len(r['findings']), r['file'], r['line']))
+    return results
@@ -0,0 +1,354 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NumberObject,
+    StreamObject,
+    create_string_object,
+)
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+# Section-at-a-time PDF builds. Each section's flowables are laid out into
+# a fragment file of their own and dropped before the next section is
+# built, so peak memory follows the largest section instead of the whole
+# report. With more than one worker the layout runs in a process pool
+# (the flowables are pickled to the workers; a bounded number of sections
+# is in flight at a time), since each section is independent of the others
+# except for page numbers. close() concatenates the fragments in order,
+# inserts the table of contents where add_contents() was called, adds one
+# bookmark per titled section and stamps "Página n de N" on every page, so
+# serial and parallel builds give the same document. Every section starts
+# on a new page: content a single build would have let flow on after the
+# previous section (the core tables PDF's cover and first table) gets a
+# page of its own.
+#
+# The merge is streamed as well: PdfStream copies one fragment at a time
+# into the output file, renumbering the objects its pages use, and the
+# footer goes in as an extra content stream of each page, so only one
+# fragment plus the xref offsets is in memory. Needs pypdf next to
+# reportlab (scripts/requirements.txt).
+
+PAGE_MARGINS = {
+    'leftMargin': 1.5 * cm,
+    'rightMargin': 1.5 * cm,
+    'topMargin': 1.5 * cm,
+    'bottomMargin': 1.5 * cm,
+}
+FOOTER_FONT = ('Helvetica', 8)
+FOOTER_FONT_RESOURCE = '/SectionFooterFont'
+FOOTER_Y = 0.8 * cm
+IN_FLIGHT_PER_WORKER = 2
+
+
+def render_section(path, flowables, pagesize=A4, margins=None):
+    # Lays out one section into `path`; a trailing PageBreak is dropped, the
+    # next fragment starts on a new page anyway.
+    if flowables and isinstance(flowables[-1], PageBreak):
+        flowables = flowables[:-1]
+    doc = SimpleDocTemplate(str(path), pagesize=pagesize, **(margins or PAGE_MARGINS))
+    doc.build(flowables)
+
+
+def contents_story(entries):
+    # Table of contents flowables for [(title, page)].
+    styles = getSampleStyleSheet()
+    rows = [[Paragraph(title.replace('&', '&amp;').replace('<', '&lt;'), styles['Normal']), str(page)]
+            for title, page in entries]
+    table = Table(rows, colWidths=[14.5 * cm, 1.5 * cm])
+    table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('LINEBELOW', (0, 0), (-1, -1), 0.25, colors.lightgrey),
+    ]))
+    return [Paragraph('Sumário', styles['Heading2']), table]
+
+
+def content_stream(data: bytes):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def footer_stream(pagesize, text):
+    # Restores the page's graphics state, then draws `text` centred at the
+    # page foot as canvas.drawCentredString would (WinAnsi, as reportlab
+    # encodes the standard fonts).
+    x = (pagesize[0] - stringWidth(text, *FOOTER_FONT)) / 2
+    literal = text.encode('cp1252').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    return content_stream(
+        b'Q BT %s %g Tf %.2f %.2f Td (%s) Tj ET\n'
+        % (FOOTER_FONT_RESOURCE.encode(), FOOTER_FONT[1], x, FOOTER_Y, literal)
+    )
+
+
+def ref(obj_id):
+    return IndirectObject(obj_id, 0, None)
+
+
+class PdfStream:
+    # Writes a PDF to `f` object by object. add_pages() copies the pages of
+    # one source document, with everything they reference renumbered into
+    # the output, and writes them right away; only the xref offsets, the
+    # page ids and the outline are kept until finish().
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = []
+        self.page_ids = []
+        self.outline = []       # (title, first page id)
+        f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.pages_id = self.reserve()
+        # Shared by every footer: the graphics-state save put before each
+        # page's own content, and the footer font.
+        self.save_state = self.write_new(content_stream(b'q\n'))
+        self.footer_font = self.write_new(DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'),
+            NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject('/' + FOOTER_FONT[0]),
+            NameObject('/Encoding'): NameObject('/WinAnsiEncoding'),
+        }))
+
+    def reserve(self):
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def write(self, obj_id, obj):
+        self.offsets[obj_id - 1] = self.f.tell()
+        self.f.write(b'%d 0 obj\n' % obj_id)
+        obj.write_to_stream(self.f)
+        self.f.write(b'\nendobj\n')
+
+    def write_new(self, obj):
+        obj_id = self.reserve()
+        self.write(obj_id, obj)
+        return ref(obj_id)
+
+    def add_footer(self, page, stream):
+        # Wraps the page's own content in q/Q and appends `stream` after it.
+        contents = page.raw_get('/Contents') if '/Contents' in page else ArrayObject()
+        if isinstance(contents.get_object(), ArrayObject):
+            contents = list(contents.get_object())
+        else:
+            contents = [contents]
+        page[NameObject('/Contents')] = ArrayObject([self.save_state, *contents, stream])
+        if '/Resources' not in page:
+            page[NameObject('/Resources')] = DictionaryObject()
+        resources = page['/Resources']
+        if '/Font' not in resources:
+            resources[NameObject('/Font')] = DictionaryObject()
+        resources['/Font'][NameObject(FOOTER_FONT_RESOURCE)] = self.footer_font
+
+    def add_pages(self, pages, title=None):
+        # Copies `pages` (PageObjects of one reader) to the output; objects
+        # they share are written once. The source objects are renumbered in
+        # place, so the reader is spent afterwards.
+        ids = {}
+        pending = deque()
+
+        def key(reference):
+            return id(reference.pdf), reference.idnum, reference.generation
+
+        def renumber(value):
+            if isinstance(value, IndirectObject):
+                if value.pdf is None:
+                    return value
+                if key(value) not in ids:
+                    ids[key(value)] = self.reserve()
+                    pending.append((ids[key(value)], value.get_object()))
+                return ref(ids[key(value)])
+            if isinstance(value, StreamObject):
+                # Streams can only be indirect objects
+                obj_id = self.reserve()
+                pending.append((obj_id, value))
+                return ref(obj_id)
+            renumber_children(value)
+            return value
+
+        def renumber_children(obj):
+            if isinstance(obj, DictionaryObject):
+                for name, value in list(obj.items()):
+                    obj[name] = renumber(value)
+            elif isinstance(obj, ArrayObject):
+                for i, value in enumerate(obj):
+                    obj[i] = renumber(value)
+
+        page_ids = []
+        for page in pages:
+            page_ids.append(self.reserve())
+            ids[key(page.indirect_reference)] = page_ids[-1]
+            if '/Parent' in page:
+                ids[key(page.raw_get('/Parent'))] = self.pages_id
+        for page, page_id in zip(pages, page_ids):
+            page[NameObject('/Parent')] = ref(self.pages_id)
+            renumber_children(page)
+            self.write(page_id, page)
+            while pending:
+                obj_id, obj = pending.popleft()
+                renumber_children(obj)
+                self.write(obj_id, obj)
+        if title and page_ids:
+            self.outline.append((title, page_ids[0]))
+        self.page_ids.extend(page_ids)
+
+    def finish(self):
+        catalog = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): ref(self.pages_id),
+        })
+        if self.outline:
+            outline_id = self.reserve()
+            item_ids = [self.reserve() for _ in self.outline]
+            for i, ((title, page_id), item_id) in enumerate(zip(self.outline, item_ids)):
+                item = DictionaryObject({
+                    NameObject('/Title'): create_string_object(title),
+                    NameObject('/Parent'): ref(outline_id),
+                    NameObject('/Dest'): ArrayObject([ref(page_id), NameObject('/Fit')]),
+                })
+                if i:
+                    item[NameObject('/Prev')] = ref(item_ids[i - 1])
+                if i + 1 < len(item_ids):
+                    item[NameObject('/Next')] = ref(item_ids[i + 1])
+                self.write(item_id, item)
+            self.write(outline_id, DictionaryObject({
+                NameObject('/Type'): NameObject('/Outlines'),
+                NameObject('/First'): ref(item_ids[0]),
+                NameObject('/Last'): ref(item_ids[-1]),
+                NameObject('/Count'): NumberObject(len(item_ids)),
+            }))
+            catalog[NameObject('/Outlines')] = ref(outline_id)
+        self.write(self.pages_id, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(ref(page_id) for page_id in self.page_ids),
+            NameObject('/Count'): NumberObject(len(self.page_ids)),
+        }))
+        root = self.write_new(catalog)
+        xref = self.f.tell()
+        self.f.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(self.offsets) + 1))
+        for offset in self.offsets:
+            self.f.write(b'%010d 00000 n \n' % offset)
+        self.f.write(b'trailer\n')
+        DictionaryObject({
+            NameObject('/Size'): NumberObject(len(self.offsets) + 1),
+            NameObject('/Root'): root,
+        }).write_to_stream(self.f)
+        self.f.write(b'\nstartxref\n%d\n%%%%EOF\n' % xref)
+
+
+class SectionWriter:
+
+    def __init__(self, out_path: Path, pagesize=A4, margins=None, workers=None):
+        self.out_path = Path(out_path)
+        self.pagesize = pagesize
+        self.margins = margins
+        self.workers = workers or os.cpu_count() or 1
+        self.tmpdir = Path(tempfile.mkdtemp(prefix=self.out_path.stem + '.'))
+        self.sections = []      # (fragment path, bookmark title or None)
+        self.contents_at = None
+        self.pool = None
+        self.pending = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def fragment_path(self, index: int) -> Path:
+        return self.tmpdir / f'section-{index:05d}.pdf'
+
+    def add(self, flowables, title=None):
+        path = self.fragment_path(len(self.sections))
+        self.sections.append((path, title))
+        if self.workers <= 1:
+            render_section(path, flowables, self.pagesize, self.margins)
+            return
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.pending.append(self.pool.submit(render_section, path, flowables, self.pagesize, self.margins))
+        while len(self.pending) > self.workers * IN_FLIGHT_PER_WORKER:
+            self.pending.popleft().result()
+
+    def add_contents(self):
+        # The table of contents goes here, before the next section added.
+        self.contents_at = len(self.sections)
+
+    def wait(self):
+        while self.pending:
+            self.pending.popleft().result()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def discard(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def render_contents(self, counts):
+        # Renders the table of contents until its own length is stable (the
+        # page numbers it lists depend on it); returns its fragment path.
+        path = self.tmpdir / 'contents.pdf'
+        contents_pages = 1
+        while True:
+            entries = []
+            page = 1
+            for i, ((_, title), count) in enumerate(zip(self.sections, counts)):
+                if i == self.contents_at:
+                    page += contents_pages
+                if title:
+                    entries.append((title, page))
+                page += count
+            render_section(path, contents_story(entries), self.pagesize, self.margins)
+            rendered = len(PdfReader(str(path)).pages)
+            if rendered == contents_pages:
+                return path
+            contents_pages = rendered
+
+    def close(self):
+        # Streams the fragments into the output one at a time; the page
+        # total is known up front from the fragments' page counts.
+        try:
+            self.wait()
+            counts = [len(PdfReader(str(path)).pages) for path, _ in self.sections]
+            order = list(self.sections)
+            if self.contents_at is not None:
+                contents = self.render_contents(counts)
+                order.insert(self.contents_at, (contents, 'Sumário'))
+                counts.append(len(PdfReader(str(contents)).pages))
+            total = sum(counts)
+            tmp = self.out_path.with_name(self.out_path.name + f'.{os.getpid()}.tmp')
+            with open(tmp, 'wb') as f:
+                out = PdfStream(f)
+                number = 1
+                for path, title in order:
+                    pages = list(PdfReader(str(path)).pages)
+                    for page in pages:
+                        out.add_footer(page, footer_stream(self.pagesize, f'Página {number} de {total}'))
+                        number += 1
+                    out.add_pages(pages, title)
+                out.finish()
+            os.replace(tmp, self.out_path)
+        finally:
+            self.discard()
@@ -0,0 +1,369 @@
+import io
+import os
+import gzip
+import zlib
+from pathlib import Path
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+
+from dump_parser import TableRows, iter_events, collect_tables, decode_row, parse_copy_header
+
+# Pure-Python reader for pg_dump custom (-Fc) and directory (-Fd) archives,
+# following pg_backup_archiver.c / pg_backup_custom.c / pg_backup_directory.c.
+# It turns the table of contents and data blocks into the same event stream
+# as dump_parser.iter_events, without a pg_restore binary. Only gzip and
+# uncompressed archives are readable; lz4/zstd need libraries we don't ship.
+
+ARCHIVE_MAGIC = b'PGDMP'
+MIN_VERSION = (1, 12, 0)
+MAX_VERSION = (1, 16, 255)
+
+# Format byte of the header (ArchiveFormat in pg_backup.h): archCustom is 1,
+# archTar 3 and archDirectory 5. pg_backup_directory.c writes archTar into
+# the toc.dat of -Fd archives (the layout is the same as an extracted -Ft
+# one), so 3 is read as a directory archive only from a toc.dat inside a
+# directory; a standalone file must be -Fc.
+FORMAT_CUSTOM = 1
+FORMAT_TAR = 3
+FORMAT_DIRECTORY = 5
+FORMAT_NAMES = {FORMAT_CUSTOM: 'custom', FORMAT_DIRECTORY: 'directory'}
+
+COMPRESSION_NONE = 0
+COMPRESSION_GZIP = 1
+COMPRESSION_NAMES = {0: 'none', 1: 'gzip', 2: 'lz4', 3: 'zstd'}
+
+BLK_DATA = 1
+BLK_BLOBS = 3
+
+# Data file suffix of a directory archive per compression method.
+DIRECTORY_SUFFIXES = {'none': ('',), 'gzip': ('.gz', '')}
+OFFSET_POS_NOT_SET = 1
+OFFSET_POS_SET = 2
+OFFSET_NO_DATA = 3
+
+READ_BUFFER = 4 * 1024 * 1024
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class ArchiveReader:
+    # Primitive readers for the archive's integer/string/offset encodings.
+
+    def __init__(self, f):
+        self.f = f
+        self.version = (0, 0, 0)
+        self.int_size = 4
+        self.off_size = 8
+
+    def read_bytes(self, n):
+        data = self.f.read(n)
+        if len(data) != n:
+            raise ArchiveError('Unexpected end of archive')
+        return data
+
+    def read_byte(self):
+        return self.read_bytes(1)[0]
+
+    def read_int(self):
+        # Sign byte, then int_size bytes, least significant first.
+        sign = self.read_byte()
+        value = int.from_bytes(self.read_bytes(self.int_size), 'little')
+        return -value if sign else value
+
+    def read_str(self):
+        n = self.read_int()
+        if n < 0:
+            return None
+        return self.read_bytes(n).decode('utf-8', errors='replace')
+
+    def read_offset(self):
+        state = self.read_byte()
+        return state, int.from_bytes(self.read_bytes(self.off_size), 'little')
+
+
+def is_archive(path: Path) -> bool:
+    if path.is_dir():
+        return (path / 'toc.dat').is_file()
+    with path.open('rb') as f:
+        return f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+def toc_path_for(path: Path) -> Path:
+    return path / 'toc.dat' if path.is_dir() else path
+
+
+def read_header(r: ArchiveReader, directory: bool = False):
+    if r.read_bytes(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+        raise ArchiveError('Not a pg_dump archive (missing PGDMP magic)')
+    vmaj = r.read_byte()
+    vmin = r.read_byte()
+    vrev = r.read_byte() if vmaj > 1 or (vmaj == 1 and vmin > 0) else 0
+    r.version = (vmaj, vmin, vrev)
+    if not MIN_VERSION <= r.version <= MAX_VERSION:
+        raise ArchiveError(f'Unsupported archive version {vmaj}.{vmin}-{vrev}')
+    r.int_size = r.read_byte()
+    r.off_size = r.read_byte()
+    fmt = r.read_byte()
+    if directory and fmt == FORMAT_TAR:
+        fmt = FORMAT_DIRECTORY
+    if fmt not in FORMAT_NAMES or (fmt == FORMAT_DIRECTORY) != directory:
+        raise ArchiveError(f'Unsupported archive format {fmt}')
+    if r.version >= (1, 15, 0):
+        compression = r.read_byte()
+    else:
+        compression = COMPRESSION_GZIP if r.read_int() != 0 else COMPRESSION_NONE
+    created = [r.read_int() for _ in range(7)]
+    header = {
+        'version': r.version,
+        'format': FORMAT_NAMES[fmt],
+        'compression': COMPRESSION_NAMES.get(compression, str(compression)),
+        'created': created,
+        'int_size': r.int_size,
+        'off_size': r.off_size,
+        'dbname': r.read_str(),
+    }
+    if r.version >= (1, 10, 0):
+        header['server_version'] = r.read_str()
+        header['pg_dump_version'] = r.read_str()
+    return header
+
+
+def read_toc(r: ArchiveReader, fmt):
+    entries = []
+    for _ in range(r.read_int()):
+        entry = {'dump_id': r.read_int(), 'had_dumper': r.read_int()}
+        entry['table_oid'] = r.read_str()
+        entry['oid'] = r.read_str()
+        entry['tag'] = r.read_str()
+        entry['desc'] = r.read_str()
+        entry['section'] = r.read_int()
+        entry['defn'] = r.read_str()
+        entry['drop_stmt'] = r.read_str()
+        entry['copy_stmt'] = r.read_str()
+        entry['namespace'] = r.read_str()
+        entry['tablespace'] = r.read_str()
+        if r.version >= (1, 14, 0):
+            entry['tableam'] = r.read_str()
+        if r.version >= (1, 16, 0):
+            entry['relkind'] = r.read_int()
+        entry['owner'] = r.read_str()
+        r.read_str()  # WITH OIDS flag, always "false" in supported versions
+        deps = []
+        while True:
+            dep = r.read_str()
+            if dep is None:
+                break
+            deps.append(dep)
+        entry['deps'] = deps
+        if fmt == 'custom':
+            entry['data_state'], entry['data_pos'] = r.read_offset()
+        else:
+            entry['filename'] = r.read_str() or None
+        entries.append(entry)
+    return entries
+
+
+def read_archive_toc(path: Path):
+    # Returns (header, entries, data_start); data_start is where the data
+    # blocks of a custom archive begin.
+    with toc_path_for(path).open('rb') as f:
+        r = ArchiveReader(f)
+        header = read_header(r, path.is_dir())
+        entries = read_toc(r, header['format'])
+        return header, entries, f.tell()
+
+
+def copy_table_name(entry):
+    # Qualified table name exactly as in the COPY statement (and so as in
+    # the plain dump), e.g. neon_auth."user".
+    copy_header = parse_copy_header((entry.get('copy_stmt') or '').strip())
+    return copy_header[0] if copy_header else None
+
+
+def iter_chunks(r: ArchiveReader):
+    while True:
+        n = r.read_int()
+        if n == 0:
+            return
+        yield r.read_bytes(n)
+
+
+def iter_block_data(r: ArchiveReader, compression):
+    chunks = iter_chunks(r)
+    if compression == 'none':
+        yield from chunks
+        return
+    if compression != 'gzip':
+        raise ArchiveError(f'Unsupported archive compression: {compression}')
+    z = zlib.decompressobj()
+    for chunk in chunks:
+        yield z.decompress(chunk)
+    yield z.flush()
+
+
+def skip_chunks(r: ArchiveReader):
+    while True:
+        n = r.read_int()
+        if n == 0:
+            return
+        r.f.seek(n, os.SEEK_CUR)
+
+
+def seek_custom_block(r: ArchiveReader, entry, data_start):
+    # Positions the reader at the data block of `entry`: a direct seek when
+    # pg_dump recorded the offset, otherwise a walk over the block headers
+    # that skips other blocks' chunks without reading them. A BLK_BLOBS
+    # block holds one (oid, chunks) run per large object, ended by oid 0.
+    if entry['data_state'] == OFFSET_POS_SET:
+        r.f.seek(entry['data_pos'])
+        if r.read_byte() not in (BLK_DATA, BLK_BLOBS) or r.read_int() != entry['dump_id']:
+            raise ArchiveError(f'Bad data block offset for dump id {entry["dump_id"]}')
+        return
+    r.f.seek(data_start)
+    while True:
+        block = r.f.read(1)
+        if not block:
+            raise ArchiveError(f'Data block for dump id {entry["dump_id"]} not found')
+        if r.read_int() == entry['dump_id']:
+            return
+        if block[0] == BLK_DATA:
+            skip_chunks(r)
+        elif block[0] == BLK_BLOBS:
+            while r.read_int() != 0:
+                skip_chunks(r)
+        else:
+            raise ArchiveError(f'Unknown data block type {block[0]}')
+
+
+class ChunkStream(io.RawIOBase):
+    # Minimal readable stream over an iterator of byte chunks, so
+    # decompressed blocks can be line-iterated through TextIOWrapper.
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        while not self.pending:
+            self.pending = next(self.chunks, None)
+            if self.pending is None:
+                self.pending = b''
+                return 0
+        n = min(len(buf), len(self.pending))
+        buf[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+
+def as_text(stream):
+    return io.TextIOWrapper(io.BufferedReader(stream, buffer_size=READ_BUFFER), encoding='utf-8', errors='replace')
+
+
+def open_directory_data(path: Path, entry, compression):
+    # Data file of `entry`: NNNN.dat, or NNNN.dat.gz for gzip archives (a
+    # file pg_dump left uncompressed is read as is).
+    if compression not in DIRECTORY_SUFFIXES:
+        raise ArchiveError(f'Unsupported archive compression: {compression}')
+    base = path / entry['filename']
+    for suffix in DIRECTORY_SUFFIXES[compression]:
+        candidate = base.with_name(base.name + suffix)
+        if candidate.exists():
+            return as_text((gzip.open if suffix == '.gz' else open)(candidate, 'rb'))
+    raise ArchiveError(f'Data file for dump id {entry["dump_id"]} not found: {base}')
+
+
+def iter_copy_lines(copy_stmt, data):
+    # COPY header, the table's data lines and a terminator, in plain-dump
+    # line form for dump_parser.iter_events.
+    return chain([copy_stmt.strip() + '\n'], data, ['\\.\n'])
+
+
+def is_table_data(entry):
+    return entry['desc'] == 'TABLE DATA' and entry.get('copy_stmt')
+
+
+def iter_archive_events(path: Path, tables=None, decode: bool = True):
+    # Same events as dump_parser.iter_dump, in TOC order: every TABLE
+    # definition, then the COPY data of each TABLE DATA entry (only those in
+    # `tables` when given; custom archives seek straight to them).
+    header, entries, data_start = read_archive_toc(path)
+    for entry in entries:
+        if entry['desc'] == 'TABLE' and entry.get('defn'):
+            yield from iter_events(io.StringIO(entry['defn']), decode)
+    data_entries = [
+        e for e in entries
+        if is_table_data(e) and (tables is None or copy_table_name(e) in tables)
+    ]
+    if header['format'] == 'directory':
+        for entry in data_entries:
+            if not entry.get('filename'):
+                yield from iter_events(iter_copy_lines(entry['copy_stmt'], []), decode)
+                continue
+            with open_directory_data(path, entry, header['compression']) as data:
+                yield from iter_events(iter_copy_lines(entry['copy_stmt'], data), decode)
+        return
+    with path.open('rb') as f:
+        r = ArchiveReader(f)
+        r.version = header['version']
+        r.int_size = header['int_size']
+        r.off_size = header['off_size']
+        for entry in data_entries:
+            if entry['data_state'] == OFFSET_NO_DATA:
+                yield from iter_events(iter_copy_lines(entry['copy_stmt'], []), decode)
+                continue
+            seek_custom_block(r, entry, data_start)
+            data = as_text(ChunkStream(iter_block_data(r, header['compression'])))
+            yield from iter_events(iter_copy_lines(entry['copy_stmt'], data), decode)
+
+
+def decode_directory_file(task):
+    path, entry, columns, compression = task
+    rows = TableRows(columns)
+    if entry.get('filename'):
+        with open_directory_data(Path(path), entry, compression) as data:
+            for line in data:
+                line = line.rstrip('\n')
+                if line == '\\.':
+                    break
+                rows.append(decode_row(line))
+    return rows
+
+
+def parse_archive(path: Path, tables=None, workers=None):
+    # Same (schema, data, copy_columns) as dump_parser.parse_dump. Schema and
+    # COPY column lists come from the TOC alone; only the data of `tables` is
+    # read, and directory archives decode their per-table files in a process
+    # pool.
+    header, entries, _ = read_archive_toc(path)
+    schema, _, _ = collect_tables(iter_archive_events(path, tables=(), decode=False))
+    copy_columns = {}
+    tasks = []
+    for entry in entries:
+        copy_header = parse_copy_header(entry['copy_stmt'].strip()) if is_table_data(entry) else None
+        if not copy_header:
+            continue
+        table_name, columns = copy_header
+        copy_columns[table_name] = columns
+        if tables is None or table_name in tables:
+            tasks.append((table_name, (str(path), entry, columns, header['compression'])))
+    if header['format'] != 'directory':
+        _, data, _ = collect_tables(iter_archive_events(path, tables, decode=False), tables)
+        return schema, data, copy_columns
+    workers = workers or os.cpu_count() or 1
+    data = {}
+    owners = [table_name for table_name, _ in tasks]
+    if workers <= 1 or len(tasks) <= 1:
+        results = map(decode_directory_file, [task for _, task in tasks])
+        for table_name, rows in zip(owners, results):
+            data.setdefault(table_name, TableRows(rows.columns)).extend(rows)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(decode_directory_file, [task for _, task in tasks])
+            for table_name, rows in zip(owners, results):
+                data.setdefault(table_name, TableRows(rows.columns)).extend(rows)
+    return schema, data, copy_columns
@@ -0,0 +1,182 @@
+import math
+import heapq
+import hashlib
+from pathlib import Path
+from collections import defaultdict
+
+from dump_index import iter_table_events
+from dump_snapshot import count_rows_cached
+
+# Row-content overlap between tables, from one pass over their COPY
+# sections. Two tables are compared on the columns they share (surrogate
+# ids and audit timestamps left out, as copied data gets new ones): every
+# row is projected on those columns, normalized and hashed once into two
+# per-table sketches, a HyperLogLog (distinct count) and a bottom-k MinHash
+# (the k smallest hashes). The rows themselves are never kept, so memory is
+# bounded by the number of sketches, not by table size. Jaccard comes from
+# the bottom-k of the union, the union size from the merged HyperLogLogs,
+# and containment of A in B is Jaccard * |A u B| / |A|. Sketches holding
+# fewer than k hashes are the full hash sets, so small tables are exact.
+
+GENERIC_COLUMNS = {'id', 'created_at', 'updated_at'}
+MIN_SHARED_COLUMNS = 3
+HLL_PRECISION = 12
+BOTTOM_K = 256
+HASH_BITS = 64
+NULL_TOKEN = '\x00'
+FIELD_SEPARATOR = '\x1f'
+
+
+def row_hash(values) -> int:
+    text = FIELD_SEPARATOR.join(NULL_TOKEN if v is None else str(v).strip().lower() for v in values)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_hash(self, h: int):
+        index = h >> (HASH_BITS - self.precision)
+        rest = h & ((1 << (HASH_BITS - self.precision)) - 1)
+        rank = HASH_BITS - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merged(self, other):
+        out = HyperLogLog(self.precision)
+        out.registers = bytearray(map(max, self.registers, other.registers))
+        return out
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return raw
+
+
+class BottomK:
+
+    def __init__(self, k=BOTTOM_K):
+        self.k = k
+        self.heap = []          # max-heap of the k smallest hashes (negated)
+        self.members = set()
+
+    def add_hash(self, h: int):
+        if h in self.members:
+            return
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, -h)
+            self.members.add(h)
+        elif h < -self.heap[0]:
+            self.members.discard(-heapq.heappushpop(self.heap, -h))
+            self.members.add(h)
+
+    def full(self) -> bool:
+        return len(self.heap) >= self.k
+
+
+class RowSketch:
+
+    def __init__(self):
+        self.rows = 0
+        self.hll = HyperLogLog()
+        self.bottom = BottomK()
+
+    def add(self, values):
+        h = row_hash(values)
+        self.rows += 1
+        self.hll.add_hash(h)
+        self.bottom.add_hash(h)
+
+    def distinct(self) -> float:
+        return len(self.bottom.members) if not self.bottom.full() else self.hll.estimate()
+
+
+def compare_sketches(a: RowSketch, b: RowSketch):
+    # (jaccard, shared distinct rows, containment of a in b, of b in a).
+    if not a.bottom.members or not b.bottom.members:
+        return 0.0, 0.0, 0.0, 0.0
+    if not a.bottom.full() and not b.bottom.full():
+        shared = len(a.bottom.members & b.bottom.members)
+        union = len(a.bottom.members | b.bottom.members)
+        jaccard = shared / union
+    else:
+        k = min(a.bottom.k, b.bottom.k)
+        union_bottom = heapq.nsmallest(k, a.bottom.members | b.bottom.members)
+        jaccard = sum(1 for h in union_bottom if h in a.bottom.members and h in b.bottom.members) / len(union_bottom)
+        union = a.hll.merged(b.hll).estimate()
+        shared = jaccard * union
+    return jaccard, shared, min(1.0, shared / a.distinct()), min(1.0, shared / b.distinct())
+
+
+def overlap_candidates(copy_columns, counts, min_shared=MIN_SHARED_COLUMNS):
+    # {(t1, t2): [shared columns]} for the non-empty tables sharing at least
+    # `min_shared` content columns, found through a column -> tables map.
+    tables_by_column = defaultdict(list)
+    for table in sorted(copy_columns):
+        if not counts.get(table):
+            continue
+        for column in copy_columns[table]:
+            if column not in GENERIC_COLUMNS:
+                tables_by_column[column].append(table)
+    shared = defaultdict(list)
+    for column in sorted(tables_by_column):
+        tables = tables_by_column[column]
+        for i, t1 in enumerate(tables):
+            for t2 in tables[i + 1:]:
+                shared[(t1, t2)].append(column)
+    return {pair: columns for pair, columns in sorted(shared.items()) if len(columns) >= min_shared}
+
+
+def find_row_overlap(dump_path: Path, min_shared=MIN_SHARED_COLUMNS):
+    # [{'table_a', 'table_b', 'columns', 'rows_a', 'rows_b', 'distinct_a',
+    # 'distinct_b', 'jaccard', 'shared', 'contained_a', 'contained_b'}] for
+    # every candidate pair, most overlapping first.
+    schema, counts = count_rows_cached(dump_path)
+    copy_columns = {t: [c for c, _ in columns] for t, columns in schema.items()}
+    candidates = overlap_candidates(copy_columns, counts, min_shared)
+    # One sketch per (table, projection); a projection shared by several
+    # pairs is hashed once.
+    projections = defaultdict(set)
+    for (t1, t2), columns in candidates.items():
+        projections[t1].add(tuple(columns))
+        projections[t2].add(tuple(columns))
+    sketches = {(t, p): RowSketch() for t, ps in projections.items() for p in ps}
+
+    positions = {}
+    for kind, table_name, payload in iter_table_events(dump_path, sorted(projections)):
+        if kind == 'copy':
+            index = {c: i for i, c in enumerate(payload)}
+            positions[table_name] = [
+                (sketches[(table_name, p)], [index.get(c) for c in p]) for p in sorted(projections[table_name])
+            ]
+        elif kind == 'row' and table_name in positions:
+            width = len(payload)
+            for sketch, picks in positions[table_name]:
+                sketch.add([payload[i] if i is not None and i < width else None for i in picks])
+
+    results = []
+    for (t1, t2), columns in candidates.items():
+        a, b = sketches[(t1, tuple(columns))], sketches[(t2, tuple(columns))]
+        jaccard, shared, contained_a, contained_b = compare_sketches(a, b)
+        results.append({
+            'table_a': t1,
+            'table_b': t2,
+            'columns': columns,
+            'rows_a': a.rows,
+            'rows_b': b.rows,
+            'distinct_a': round(a.distinct()),
+            'distinct_b': round(b.distinct()),
+            'jaccard': jaccard,
+            'shared': round(shared),
+            'contained_a': contained_a,
+            'contained_b': contained_b,
+        })
+    results.sort(key=lambda r: (-max(r['contained_a'], r['contained_b']), -r['jaccard'], r['table_a'], r['table_b']))
+    return results
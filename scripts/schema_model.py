@@ -0,0 +1,922 @@
+import io
+import re
+import mmap
+from pathlib import Path
+from bisect import bisect_right
+
+from dump_index import map_dump, scan_sections
+from dump_parser import is_plain_dump, open_dump, parse_copy_header
+from migration_catalog import JS_DOWN_RE, iter_ddl_statements, iter_migration_paths
+from pg_archive import is_archive, read_archive_toc
+from sql_extract import keyword, normalize_table_name, read_name, tokenize_sql
+
+# Offline schema model built by replaying DDL: the migrations under
+# src/migrations in order, or the DDL part of a dump (COPY data is skipped).
+# Tables hold their columns (normalized type, NOT NULL, default) and
+# constraints; indexes live in a per-schema namespace as in PostgreSQL.
+# Unnamed constraints and indexes get the names PostgreSQL (or
+# node-pg-migrate, for pgm.createIndex) would give them, so a model
+# replayed from migrations can be diffed name by name against one replayed
+# from pg_dump output. Statements the model cannot apply (ALTER on an
+# unknown table, an index on a missing column, ...) are kept as warnings.
+
+NAMEDATALEN = 63
+
+TYPE_ALIASES = {
+    'int': 'integer',
+    'int4': 'integer',
+    'serial': 'integer',
+    'serial4': 'integer',
+    'int8': 'bigint',
+    'bigserial': 'bigint',
+    'serial8': 'bigint',
+    'int2': 'smallint',
+    'smallserial': 'smallint',
+    'serial2': 'smallint',
+    'varchar': 'character varying',
+    'char': 'character',
+    'bpchar': 'character',
+    'bool': 'boolean',
+    'decimal': 'numeric',
+    'float': 'double precision',
+    'float8': 'double precision',
+    'float4': 'real',
+    'timestamp': 'timestamp without time zone',
+    'timestamptz': 'timestamp with time zone',
+    'time': 'time without time zone',
+    'timetz': 'time with time zone',
+}
+SERIAL_TYPES = {'serial', 'serial4', 'bigserial', 'serial8', 'smallserial', 'serial2'}
+
+COLUMN_CONSTRAINT_WORDS = {
+    'CONSTRAINT', 'NOT', 'NULL', 'DEFAULT', 'PRIMARY', 'UNIQUE', 'REFERENCES', 'CHECK', 'GENERATED', 'COLLATE',
+}
+TABLE_CONSTRAINT_WORDS = {'CONSTRAINT', 'PRIMARY', 'UNIQUE', 'FOREIGN', 'CHECK', 'EXCLUDE'}
+CONSTRAINT_TYPES = {'PRIMARY': 'primary key', 'UNIQUE': 'unique', 'FOREIGN': 'foreign key', 'CHECK': 'check',
+                    'REFERENCES': 'foreign key', 'EXCLUDE': 'exclude'}
+CONSTRAINT_LABELS = {'primary key': 'pkey', 'unique': 'key', 'foreign key': 'fkey', 'check': 'check', 'exclude': 'excl'}
+NAME_PREFIXES = {'IF', 'NOT', 'EXISTS', 'ONLY', 'CONCURRENTLY'}
+
+
+def unquote(name: str) -> str:
+    return name[1:-1].replace('""', '"') if name.startswith('"') else name.lower()
+
+
+def split_name(name: str):
+    # (schema, name) of a normalized qualified name.
+    return tuple(normalize_table_name(name).split('.', 1))
+
+
+def make_object_name(name1: str, name2, label: str) -> str:
+    # PostgreSQL's makeObjectName: name1_name2_label, shortening the longer
+    # of name1/name2 until the result fits in NAMEDATALEN.
+    overhead = len(label) + 1 + (1 if name2 else 0)
+    len1, len2 = len(name1), len(name2 or '')
+    while len1 + len2 > NAMEDATALEN - overhead:
+        if len1 > len2:
+            len1 -= 1
+        else:
+            len2 -= 1
+    return '_'.join(part for part in (name1[:len1], (name2 or '')[:len2], label) if part)
+
+
+def split_top_level(tokens, separator=','):
+    # Token lists between `separator` tokens outside parentheses/brackets.
+    parts = []
+    current = []
+    depth = 0
+    for token in tokens:
+        if token[0] == 'op' and token[1] in '([':
+            depth += 1
+        elif token[0] == 'op' and token[1] in ')]':
+            depth -= 1
+        if depth == 0 and token[0] == 'op' and token[1] == separator:
+            parts.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        parts.append(current)
+    return parts
+
+
+def paren_body(tokens, i):
+    # (tokens inside the parentheses opening at tokens[i], index after ')').
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j][0] == 'op' and tokens[j][1] in '([':
+            depth += 1
+        elif tokens[j][0] == 'op' and tokens[j][1] in ')]':
+            depth -= 1
+            if depth == 0:
+                return tokens[i + 1:j], j + 1
+    return tokens[i + 1:], len(tokens)
+
+
+def skip_keywords(tokens, i, words):
+    while i < len(tokens) and keyword(tokens[i]) in words:
+        i += 1
+    return i
+
+
+def column_list(tokens):
+    return [unquote(part[0][1]) for part in split_top_level(tokens) if part and part[0][0] in ('ident', 'qident')]
+
+
+def sql_text(tokens) -> str:
+    # Tokens joined back into compact SQL text.
+    out = []
+    for kind, text, _ in tokens:
+        if out and not (text in ',)].:' or out[-1] in '([.:' or (text in '([' and kind == 'op')):
+            out.append(' ')
+        out.append(text)
+    return ''.join(out)
+
+
+def normalize_type(tokens):
+    # Type name as pg_dump prints it: VARCHAR(50) -> character varying(50),
+    # TIMESTAMPTZ -> timestamp with time zone, SERIAL -> integer, ...
+    words = []
+    args = ''
+    arrays = 0
+    i = 0
+    while i < len(tokens):
+        kind, text, _ = tokens[i]
+        if kind == 'op' and text == '(':
+            body, i = paren_body(tokens, i)
+            args = '(' + ','.join(t[1] for t in body if t[1] != ',') + ')'
+            continue
+        if kind == 'op' and text == '[':
+            _, i = paren_body(tokens, i)
+            arrays += 1
+            continue
+        if kind == 'op' and text == '.' and words:
+            words.pop()  # schema qualifier
+        elif kind in ('ident', 'qident'):
+            words.append(unquote(text))
+        i += 1
+    base = ' '.join(words)
+    if base in ('timestamp with time zone', 'timestamp without time zone', 'time with time zone',
+                'time without time zone'):
+        head, tail = base.split(' ', 1)
+        return f'{head}{args} {tail}' + '[]' * arrays
+    base = TYPE_ALIASES.get(base, base)
+    if ' ' in base and base.startswith(('timestamp', 'time')) and args:
+        head, tail = base.split(' ', 1)
+        return f'{head}{args} {tail}' + '[]' * arrays
+    return base + args + '[]' * arrays
+
+
+class SchemaModel:
+
+    def __init__(self):
+        self.tables = {}       # name -> {'columns': {...}, 'constraints': {...}}
+        self.indexes = {}      # schema.index -> {'table', 'columns', 'unique', 'partial'}
+        self.views = {}        # name -> source
+        self.warnings = []
+
+    def warn(self, source, message):
+        self.warnings.append(f'{source}: {message}')
+
+    # -- tables -----------------------------------------------------------
+
+    def create_table(self, table, source, if_not_exists=False):
+        if table in self.tables:
+            if not if_not_exists:
+                self.warn(source, f'CREATE TABLE {table}: tabela já existe')
+            return None
+        self.tables[table] = {'columns': {}, 'constraints': {}}
+        return self.tables[table]
+
+    def get_table(self, table, source, if_exists=False):
+        entry = self.tables.get(table)
+        if entry is None and not if_exists:
+            self.warn(source, f'{table}: tabela inexistente')
+        return entry
+
+    def drop_table(self, table, source, if_exists=False):
+        if self.tables.pop(table, None) is None:
+            if table in self.views:
+                del self.views[table]
+            elif not if_exists:
+                self.warn(source, f'DROP TABLE {table}: tabela inexistente')
+            return
+        for name in [n for n, index in self.indexes.items() if index['table'] == table]:
+            del self.indexes[name]
+
+    def add_column(self, table, name, type_name, source, not_null=False, default=None, if_not_exists=False):
+        entry = self.tables[table]
+        if name in entry['columns']:
+            if not if_not_exists:
+                self.warn(source, f'{table}.{name}: coluna já existe')
+            return False
+        entry['columns'][name] = {'type': type_name, 'not_null': not_null, 'default': default}
+        return True
+
+    def drop_column(self, table, name, source, if_exists=False):
+        entry = self.tables[table]
+        if entry['columns'].pop(name, None) is None:
+            if not if_exists:
+                self.warn(source, f'{table}.{name}: coluna inexistente')
+            return
+        # Dropping a column drops the indexes and constraints that use it.
+        for index_name in [n for n, index in self.indexes.items()
+                           if index['table'] == table and name in index['columns']]:
+            del self.indexes[index_name]
+        for constraint in [n for n, c in entry['constraints'].items() if name in c['columns']]:
+            del entry['constraints'][constraint]
+
+    def rename_column(self, table, old, new, source):
+        entry = self.tables[table]
+        if old not in entry['columns']:
+            self.warn(source, f'{table}.{old}: coluna inexistente')
+            return
+        entry['columns'] = {new if k == old else k: v for k, v in entry['columns'].items()}
+        for c in entry['constraints'].values():
+            c['columns'] = [new if col == old else col for col in c['columns']]
+        for index in self.indexes.values():
+            if index['table'] == table:
+                index['columns'] = [new if col == old else col for col in index['columns']]
+
+    def rename_table(self, table, new, source):
+        if new in self.tables:
+            self.warn(source, f'ALTER TABLE {table} RENAME TO {new}: tabela já existe')
+            return
+        self.tables[new] = self.tables.pop(table)
+        for index in self.indexes.values():
+            if index['table'] == table:
+                index['table'] = new
+
+    def add_constraint(self, table, ctype, columns, source, name=None, column=None):
+        entry = self.tables[table]
+        table_name = split_name(table)[1]
+        if not name:
+            if ctype == 'primary key':
+                base = make_object_name(table_name, None, 'pkey')
+            else:
+                base = make_object_name(table_name, '_'.join(columns) or column, CONSTRAINT_LABELS[ctype])
+            name = base
+            n = 0
+            while name in entry['constraints']:
+                n += 1
+                name = f'{base}{n}'
+        elif name in entry['constraints']:
+            self.warn(source, f'{table}: constraint {name} já existe')
+            return
+        if ctype == 'primary key':
+            for col in columns:
+                if col in entry['columns']:
+                    entry['columns'][col]['not_null'] = True
+        entry['constraints'][name] = {'type': ctype, 'columns': list(columns)}
+
+    # -- indexes ----------------------------------------------------------
+
+    def create_index(self, name, table, columns, source, unique=False, partial=False, if_not_exists=False):
+        entry = self.get_table(table, source)
+        if entry is None:
+            return
+        unknown = [col for col in columns if col not in entry['columns']]
+        if unknown:
+            self.warn(source, f'índice em {table} usa colunas inexistentes: {", ".join(unknown)}')
+            return
+        schema = split_name(table)[0]
+        if not name:
+            base = make_object_name(split_name(table)[1], '_'.join(columns), 'key' if unique else 'idx')
+            name = base
+            n = 0
+            while f'{schema}.{name}' in self.indexes:
+                n += 1
+                name = f'{base}{n}'
+        key = f'{schema}.{name}'
+        if key in self.indexes:
+            if not if_not_exists:
+                self.warn(source, f'índice {key} já existe')
+            return
+        self.indexes[key] = {'table': table, 'columns': list(columns), 'unique': unique, 'partial': partial}
+
+    # -- SQL replay -------------------------------------------------------
+
+    def apply_sql(self, sql: str, source: str):
+        # Applies every DDL statement of `sql`, DO blocks included.
+        newlines = [m.start() for m in re.finditer('\n', sql)]
+        for tokens in iter_ddl_statements(sql):
+            self.apply_statement(tokens, f'{source}:{bisect_right(newlines, tokens[0][2]) + 1}')
+
+    def apply_statement(self, tokens, source):
+        verb = keyword(tokens[0])
+        i = 1
+        if verb == 'CREATE':
+            i = skip_keywords(tokens, i, {'OR', 'REPLACE', 'TEMP', 'TEMPORARY', 'UNLOGGED', 'GLOBAL', 'LOCAL'})
+            unique = i < len(tokens) and keyword(tokens[i]) == 'UNIQUE'
+            i += unique
+            target = keyword(tokens[i]) if i < len(tokens) else None
+            if target == 'TABLE':
+                self.sql_create_table(tokens, i + 1, source)
+            elif target == 'INDEX':
+                self.sql_create_index(tokens, i + 1, source, unique)
+            elif target in ('VIEW', 'MATERIALIZED'):
+                i = skip_keywords(tokens, i, {'VIEW', 'MATERIALIZED', 'IF', 'NOT', 'EXISTS'})
+                name, _ = read_name(tokens, i)
+                if name:
+                    self.views[normalize_table_name(name)] = source
+            return
+        target = keyword(tokens[i]) if i < len(tokens) else None
+        if verb == 'ALTER' and target == 'TABLE':
+            self.sql_alter_table(tokens, i + 1, source)
+        elif verb == 'ALTER' and target == 'INDEX':
+            i = skip_keywords(tokens, i + 1, NAME_PREFIXES)
+            name, i = read_name(tokens, i)
+            if name and len(tokens) > i + 2 and keyword(tokens[i]) == 'RENAME':
+                old = '.'.join(split_name(name))
+                index = self.indexes.pop(old, None)
+                if index is None:
+                    self.warn(source, f'ALTER INDEX {old}: índice inexistente')
+                else:
+                    self.indexes[f'{split_name(name)[0]}.{unquote(tokens[i + 2][1])}'] = index
+        elif verb == 'DROP' and target in ('TABLE', 'INDEX', 'VIEW'):
+            i = skip_keywords(tokens, i + 1, NAME_PREFIXES)
+            if_exists = any(keyword(t) == 'EXISTS' for t in tokens[:i])
+            for part in split_top_level(tokens[i:]):
+                name, _ = read_name(part, 0)
+                if not name:
+                    continue
+                qualified = normalize_table_name(name)
+                if target == 'TABLE':
+                    self.drop_table(qualified, source, if_exists)
+                elif target == 'VIEW':
+                    if self.views.pop(qualified, None) is None and not if_exists:
+                        self.warn(source, f'DROP VIEW {qualified}: view inexistente')
+                elif self.indexes.pop(qualified, None) is None and not if_exists:
+                    self.warn(source, f'DROP INDEX {qualified}: índice inexistente')
+
+    def sql_create_table(self, tokens, i, source):
+        if_not_exists = keyword(tokens[i]) == 'IF' if i < len(tokens) else False
+        i = skip_keywords(tokens, i, NAME_PREFIXES)
+        name, i = read_name(tokens, i)
+        if not name:
+            return
+        table = normalize_table_name(name)
+        if i >= len(tokens) or tokens[i][1] != '(':
+            self.warn(source, f'CREATE TABLE {table}: definição não suportada')
+            return
+        if self.create_table(table, source, if_not_exists) is None:
+            return
+        body, _ = paren_body(tokens, i)
+        constraints = []
+        for element in split_top_level(body):
+            if keyword(element[0]) in TABLE_CONSTRAINT_WORDS or keyword(element[0]) == 'LIKE':
+                constraints.append(element)
+            else:
+                self.sql_column(table, element, source)
+        for element in constraints:
+            self.sql_table_constraint(table, element, source)
+
+    def sql_column(self, table, element, source, if_not_exists=False):
+        name = unquote(element[0][1])
+        j = 1
+        while j < len(element) and not (keyword(element[j]) in COLUMN_CONSTRAINT_WORDS):
+            if element[j][1] in '([':
+                _, j = paren_body(element, j)
+            else:
+                j += 1
+        type_tokens = element[1:j]
+        raw_type = type_tokens[0][1].lower() if type_tokens else ''
+        not_null = raw_type in SERIAL_TYPES
+        default = f"nextval('{split_name(table)[1]}_{name}_seq'::regclass)" if raw_type in SERIAL_TYPES else None
+        pending = []
+        constraint_name = None
+        while j < len(element):
+            kw = keyword(element[j])
+            if kw == 'DEFAULT' and keyword(element[j - 1]) == 'SET':
+                j += 1  # ON DELETE SET DEFAULT
+                continue
+            if kw == 'CONSTRAINT' and j + 1 < len(element):
+                constraint_name = unquote(element[j + 1][1])
+                j += 2
+                continue
+            if kw == 'NOT' and j + 1 < len(element) and keyword(element[j + 1]) == 'NULL':
+                not_null = True
+                j += 2
+            elif kw == 'DEFAULT':
+                k = j + 1
+                while k < len(element) and (k == j + 1 or keyword(element[k]) not in COLUMN_CONSTRAINT_WORDS):
+                    k = paren_body(element, k)[1] if element[k][1] == '(' else k + 1
+                default = sql_text(element[j + 1:k])
+                if default.upper() == 'NULL':
+                    default = None
+                j = k
+            elif kw in ('PRIMARY', 'UNIQUE', 'REFERENCES', 'CHECK'):
+                pending.append((CONSTRAINT_TYPES[kw], constraint_name))
+                if kw == 'PRIMARY':
+                    not_null = True
+                j += 1
+                if kw == 'CHECK' and j < len(element):
+                    j = paren_body(element, j)[1]
+                elif kw == 'REFERENCES':
+                    _, j = read_name(element, j)
+            else:
+                j += 1
+            constraint_name = None
+        if not self.add_column(table, name, normalize_type(type_tokens), source, not_null, default, if_not_exists):
+            return
+        for ctype, cname in pending:
+            columns = [name] if ctype != 'check' else []
+            self.add_constraint(table, ctype, columns, source, cname, column=name)
+
+    def sql_table_constraint(self, table, element, source):
+        name = None
+        j = 0
+        if keyword(element[0]) == 'CONSTRAINT' and len(element) > 1:
+            name = unquote(element[1][1])
+            j = 2
+        kw = keyword(element[j]) if j < len(element) else None
+        if kw not in CONSTRAINT_TYPES:
+            return
+        ctype = CONSTRAINT_TYPES[kw]
+        columns = []
+        if ctype == 'check':
+            # PostgreSQL names an unnamed CHECK after the first column it uses.
+            body, _ = paren_body(element, j + 1) if j + 1 < len(element) else ([], 0)
+            known = self.tables[table]['columns']
+            first = next((unquote(t[1]) for t in body if t[0] in ('ident', 'qident') and unquote(t[1]) in known), None)
+            self.add_constraint(table, ctype, [], source, name, column=first)
+            return
+        for k in range(j + 1, len(element)):
+            if element[k][1] == '(':
+                columns = column_list(paren_body(element, k)[0])
+                break
+        self.add_constraint(table, ctype, columns, source, name)
+
+    def sql_alter_table(self, tokens, i, source):
+        if_exists = keyword(tokens[i]) == 'IF' if i < len(tokens) else False
+        i = skip_keywords(tokens, i, NAME_PREFIXES)
+        name, i = read_name(tokens, i)
+        if not name:
+            return
+        table = normalize_table_name(name)
+        if self.get_table(table, source, if_exists) is None:
+            return
+        for action in split_top_level(tokens[i:]):
+            self.sql_alter_action(table, action, source)
+            if table not in self.tables:
+                break
+
+    def sql_alter_action(self, table, action, source):
+        if len(action) < 2:
+            return
+        kw = keyword(action[0])
+        j = 1
+        if kw == 'ADD':
+            if j < len(action) and keyword(action[j]) in TABLE_CONSTRAINT_WORDS:
+                self.sql_table_constraint(table, action[j:], source)
+                return
+            j = skip_keywords(action, j, {'COLUMN'})
+            if_not_exists = j < len(action) and keyword(action[j]) == 'IF'
+            j = skip_keywords(action, j, {'IF', 'NOT', 'EXISTS'})
+            if j < len(action):
+                self.sql_column(table, action[j:], source, if_not_exists)
+        elif kw == 'DROP':
+            if keyword(action[j]) == 'CONSTRAINT':
+                if_exists = keyword(action[j + 1]) == 'IF'
+                k = skip_keywords(action, j + 1, {'IF', 'EXISTS'})
+                cname = unquote(action[k][1])
+                if self.tables[table]['constraints'].pop(cname, None) is None and not if_exists:
+                    self.warn(source, f'{table}: constraint {cname} inexistente')
+                return
+            j = skip_keywords(action, j, {'COLUMN'})
+            if_exists = keyword(action[j]) == 'IF'
+            j = skip_keywords(action, j, {'IF', 'EXISTS'})
+            self.drop_column(table, unquote(action[j][1]), source, if_exists)
+        elif kw == 'ALTER':
+            j = skip_keywords(action, j, {'COLUMN'})
+            column = unquote(action[j][1])
+            spec = self.tables[table]['columns'].get(column)
+            if spec is None:
+                self.warn(source, f'{table}.{column}: coluna inexistente')
+                return
+            rest = action[j + 1:]
+            words = [keyword(t) for t in rest[:3]]
+            if 'TYPE' in words:
+                k = words.index('TYPE') + 1
+                end = next((n for n in range(k, len(rest)) if keyword(rest[n]) in ('USING', 'COLLATE')), len(rest))
+                spec['type'] = normalize_type(rest[k:end])
+            elif words[:2] == ['SET', 'NOT']:
+                spec['not_null'] = True
+            elif words[:2] == ['DROP', 'NOT']:
+                spec['not_null'] = False
+            elif words[:2] == ['SET', 'DEFAULT']:
+                spec['default'] = sql_text(rest[2:])
+            elif words[:2] == ['DROP', 'DEFAULT']:
+                spec['default'] = None
+        elif kw == 'RENAME':
+            words = [keyword(t) for t in action]
+            if len(action) < 3:
+                return
+            if words[1] == 'TO':
+                self.rename_table(table, normalize_table_name(f'{split_name(table)[0]}.{action[2][1]}'), source)
+            elif words[1] == 'CONSTRAINT' and len(action) > 4:
+                constraints = self.tables[table]['constraints']
+                old = unquote(action[2][1])
+                if old in constraints:
+                    constraints[unquote(action[4][1])] = constraints.pop(old)
+            else:
+                k = 2 if words[1] == 'COLUMN' else 1
+                if len(action) > k + 2:
+                    self.rename_column(table, unquote(action[k][1]), unquote(action[k + 2][1]), source)
+
+    def sql_create_index(self, tokens, i, source, unique):
+        if_not_exists = any(keyword(t) == 'EXISTS' for t in tokens[i:i + 4])
+        i = skip_keywords(tokens, i, NAME_PREFIXES)
+        name = None
+        if keyword(tokens[i]) != 'ON':
+            name = unquote(tokens[i][1])
+            i += 1
+        if i >= len(tokens) or keyword(tokens[i]) != 'ON':
+            return
+        table_name, i = read_name(tokens, skip_keywords(tokens, i + 1, {'ONLY'}))
+        if not table_name:
+            return
+        table = normalize_table_name(table_name)
+        while i < len(tokens) and tokens[i][1] != '(':
+            i += 1
+        body, end = paren_body(tokens, i)
+        entry = self.tables.get(table)
+        known = entry['columns'] if entry else {}
+        # Key columns in order; for expressions, the columns they use.
+        columns = []
+        for part in split_top_level(body):
+            for t in part:
+                col = unquote(t[1]) if t[0] in ('ident', 'qident') else None
+                if col in known and col not in columns:
+                    columns.append(col)
+                    break
+            else:
+                if part and part[0][0] in ('ident', 'qident') and (len(part) == 1 or keyword(part[1]) in ('ASC', 'DESC')):
+                    columns.append(unquote(part[0][1]))
+        partial = any(keyword(t) == 'WHERE' for t in tokens[end:])
+        self.create_index(name, table, columns, source, unique, partial, if_not_exists)
+
+    # -- node-pg-migrate replay ---------------------------------------------
+
+    def apply_pgm(self, text: str, source: str):
+        # Applies the up() step of a node-pg-migrate migration.
+        down = JS_DOWN_RE.search(text)
+        end = down.start() if down else len(text)
+        newlines = [m.start() for m in re.finditer('\n', text)]
+        for offset, method, args in iter_pgm_calls(text, end):
+            where = f'{source}:{bisect_right(newlines, offset) + 1}'
+            if method == 'sql' and args and isinstance(args[0], str):
+                self.apply_sql(args[0], where)
+                continue
+            handler = getattr(self, f'pgm_{method}', None)
+            if handler and args:
+                handler(where, *args)
+
+    def pgm_createTable(self, source, name, columns=None, options=None):
+        table = normalize_table_name(pgm_name(name))
+        options = options if isinstance(options, dict) else {}
+        if self.create_table(table, source, bool(options.get('ifNotExists'))) is None:
+            return
+        self.pgm_addColumns(source, name, columns or {})
+        for ctype, key in (('primary key', 'primaryKey'), ('unique', 'unique')):
+            cols = (options.get('constraints') or {}).get(key)
+            if cols:
+                self.add_constraint(table, ctype, [cols] if isinstance(cols, str) else cols, source)
+
+    def pgm_addColumns(self, source, name, columns, options=None):
+        table = normalize_table_name(pgm_name(name))
+        if self.get_table(table, source) is None or not isinstance(columns, dict):
+            return
+        if_not_exists = isinstance(options, dict) and bool(options.get('ifNotExists'))
+        for column, spec in columns.items():
+            spec = {'type': spec} if isinstance(spec, str) else spec
+            raw_type = str(spec.get('type', '')).strip()
+            serial = raw_type.lower() in SERIAL_TYPES
+            default = spec.get('default')
+            default = f"nextval('{split_name(table)[1]}_{column}_seq'::regclass)" if serial else (
+                None if default is None else pgm_default(default))
+            not_null = bool(spec.get('notNull') or spec.get('primaryKey') or serial)
+            if not self.add_column(table, column, normalize_type(tokenize_sql(raw_type)), source, not_null, default,
+                                   if_not_exists):
+                continue
+            if spec.get('primaryKey'):
+                self.add_constraint(table, 'primary key', [column], source)
+            if spec.get('unique'):
+                self.add_constraint(table, 'unique', [column], source)
+            if spec.get('references'):
+                self.add_constraint(table, 'foreign key', [column], source)
+            if spec.get('check'):
+                self.add_constraint(table, 'check', [], source, column=column)
+
+    pgm_addColumn = pgm_addColumns
+
+    def pgm_dropColumns(self, source, name, columns, options=None):
+        table = normalize_table_name(pgm_name(name))
+        if self.get_table(table, source) is None:
+            return
+        columns = [columns] if isinstance(columns, str) else columns
+        for column in columns if isinstance(columns, list) else columns.keys():
+            self.drop_column(table, column, source, isinstance(options, dict) and bool(options.get('ifExists')))
+
+    pgm_dropColumn = pgm_dropColumns
+
+    def pgm_renameColumn(self, source, name, old, new):
+        table = normalize_table_name(pgm_name(name))
+        if self.get_table(table, source) is not None:
+            self.rename_column(table, old, new, source)
+
+    def pgm_alterColumn(self, source, name, column, options):
+        table = normalize_table_name(pgm_name(name))
+        entry = self.get_table(table, source)
+        if entry is None or not isinstance(options, dict):
+            return
+        spec = entry['columns'].get(column)
+        if spec is None:
+            self.warn(source, f'{table}.{column}: coluna inexistente')
+            return
+        if 'type' in options:
+            spec['type'] = normalize_type(tokenize_sql(str(options['type'])))
+        if 'notNull' in options:
+            spec['not_null'] = bool(options['notNull'])
+        if 'default' in options:
+            spec['default'] = None if options['default'] is None else pgm_default(options['default'])
+
+    def pgm_dropTable(self, source, name, options=None):
+        self.drop_table(normalize_table_name(pgm_name(name)), source,
+                        isinstance(options, dict) and bool(options.get('ifExists')))
+
+    def pgm_createIndex(self, source, name, columns, options=None):
+        # node-pg-migrate names indexes <table>_<columns>_index (or
+        # _unique_index) unless a name is given.
+        table = normalize_table_name(pgm_name(name))
+        options = options if isinstance(options, dict) else {}
+        columns = [columns] if isinstance(columns, str) else [c if isinstance(c, str) else c.get('name') for c in columns]
+        unique = bool(options.get('unique'))
+        index_name = options.get('name') or '_'.join(
+            [split_name(table)[1]] + columns + (['unique', 'index'] if unique else ['index']))
+        self.create_index(index_name, table, columns, source, unique, bool(options.get('where')),
+                          bool(options.get('ifNotExists')))
+
+    pgm_addIndex = pgm_createIndex
+
+    def pgm_dropIndex(self, source, name, columns, options=None):
+        table = normalize_table_name(pgm_name(name))
+        options = options if isinstance(options, dict) else {}
+        columns = [columns] if isinstance(columns, str) else columns
+        index_name = options.get('name') or '_'.join([split_name(table)[1]] + list(columns) + ['index'])
+        self.indexes.pop(f'{split_name(table)[0]}.{index_name}', None)
+
+    def pgm_addConstraint(self, source, name, constraint_name, spec):
+        table = normalize_table_name(pgm_name(name))
+        if self.get_table(table, source) is None:
+            return
+        if isinstance(spec, str):
+            tokens = tokenize_sql(spec)
+            if constraint_name:
+                tokens = [('ident', 'CONSTRAINT', 0), ('qident', f'"{constraint_name}"', 0)] + tokens
+            self.sql_table_constraint(table, tokens, source)
+            return
+        for key, ctype in (('primaryKey', 'primary key'), ('unique', 'unique'), ('foreignKeys', 'foreign key'),
+                           ('check', 'check')):
+            if spec.get(key) is not None:
+                value = spec[key]
+                columns = value if isinstance(value, list) and ctype != 'check' else (
+                    [value] if isinstance(value, str) and ctype != 'check' else [])
+                self.add_constraint(table, ctype, columns, source, constraint_name)
+
+    pgm_createConstraint = pgm_addConstraint
+
+    def pgm_dropConstraint(self, source, name, constraint_name, options=None):
+        table = normalize_table_name(pgm_name(name))
+        entry = self.get_table(table, source)
+        if entry is not None and entry['constraints'].pop(constraint_name, None) is None:
+            if not (isinstance(options, dict) and options.get('ifExists')):
+                self.warn(source, f'{table}: constraint {constraint_name} inexistente')
+
+
+# -- JS argument parsing for pgm.* calls ---------------------------------------
+
+JS_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+|//[^\n]*|/\*.*?\*/)
+    |(?P<str>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`(?:[^`\\]|\\.)*`)
+    |(?P<num>-?\d+(?:\.\d+)?)
+    |(?P<name>[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)
+    |(?P<op>.)
+    """,
+    re.S | re.X,
+)
+JS_LITERALS = {'true': True, 'false': False, 'null': None, 'undefined': None}
+
+
+class PgmFunc(str):
+    # pgm.func('...'): raw SQL rather than a value.
+    pass
+
+
+def js_tokens(text: str, start: int, end: int):
+    return [(m.lastgroup, m.group(), m.start()) for m in JS_TOKEN_RE.finditer(text, start, end) if m.lastgroup != 'ws']
+
+
+def parse_js_value(tokens, i):
+    # (value, next index) for the JS literal at tokens[i]; objects become
+    # dicts, arrays lists, pgm.func(...) a PgmFunc, anything else None.
+    kind, text, _ = tokens[i]
+    if kind == 'str':
+        return re.sub(r'\\(.)', r'\1', text[1:-1]), i + 1
+    if kind == 'num':
+        return float(text) if '.' in text else int(text), i + 1
+    if kind == 'op' and text in '{[':
+        close = '}' if text == '{' else ']'
+        result = {} if text == '{' else []
+        i += 1
+        while i < len(tokens) and tokens[i][1] != close:
+            if tokens[i][1] == ',':
+                i += 1
+                continue
+            if text == '{':
+                key = tokens[i][1].strip('\'"`')
+                if i + 1 < len(tokens) and tokens[i + 1][1] == ':':
+                    result[key], i = parse_js_value(tokens, i + 2)
+                else:
+                    i += 1
+            else:
+                value, i = parse_js_value(tokens, i)
+                result.append(value)
+        return result, i + 1
+    if kind == 'name':
+        if i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+            args, i = parse_js_args(tokens, i + 2)
+            if text.endswith('.func') and args and isinstance(args[0], str):
+                return PgmFunc(args[0]), i
+            return None, i
+        return JS_LITERALS.get(text), i + 1
+    return None, i + 1
+
+
+def parse_js_args(tokens, i):
+    # Arguments of a call whose "(" precedes tokens[i]: (args, index after ")").
+    args = []
+    while i < len(tokens) and tokens[i][1] != ')':
+        if tokens[i][1] == ',':
+            i += 1
+            continue
+        value, i = parse_js_value(tokens, i)
+        args.append(value)
+    return args, i + 1
+
+
+def iter_pgm_calls(text: str, end: int):
+    # (offset, method, args) for every pgm.<method>(...) call before `end`.
+    tokens = js_tokens(text, 0, end)
+    i = 0
+    while i < len(tokens):
+        kind, name, offset = tokens[i]
+        if kind == 'name' and name.startswith('pgm.') and i + 1 < len(tokens) and tokens[i + 1][1] == '(':
+            args, i = parse_js_args(tokens, i + 2)
+            yield offset, name[4:], args
+        else:
+            i += 1
+
+
+def pgm_name(name):
+    # node-pg-migrate names are a string or {schema, name}.
+    if isinstance(name, dict):
+        return f'"{name.get("schema", "public")}"."{name.get("name")}"'
+    return name
+
+
+def pgm_default(value):
+    if isinstance(value, PgmFunc):
+        return str(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+# -- sources -------------------------------------------------------------------
+
+def schema_from_migrations(root: Path):
+    # Model after replaying every migration under src/migrations in order.
+    model = SchemaModel()
+    for path in iter_migration_paths(root):
+        text = path.read_text(encoding='utf-8', errors='ignore')
+        if path.suffix == '.js':
+            model.apply_pgm(text, path.name)
+        else:
+            model.apply_sql(text, path.name)
+    return model
+
+
+def dump_ddl(path: Path) -> str:
+    # The SQL of a dump without its COPY data: the plain file with every COPY
+    # section cut out, or the TOC definitions of a pg_dump archive.
+    if is_archive(path):
+        _, entries, _ = read_archive_toc(path)
+        return '\n'.join(entry['defn'] for entry in entries if entry['defn'])
+    if is_plain_dump(path):
+        mm = map_dump(path)
+        try:
+            parts = []
+            pos = 0
+            for kind, _, start, end, *_ in scan_sections(mm):
+                if kind == 'copy':
+                    parts.append(mm[pos:start])
+                    pos = end
+            parts.append(mm[pos:])
+        finally:
+            if isinstance(mm, mmap.mmap):
+                mm.close()
+        return b''.join(parts).decode('utf-8', errors='replace')
+    out = io.StringIO()
+    with open_dump(path) as f:
+        in_copy = False
+        for line in f:
+            if in_copy:
+                in_copy = line.rstrip('\n') != '\\.'
+            elif line.startswith('COPY ') and parse_copy_header(line.rstrip('\n')):
+                in_copy = True
+            else:
+                out.write(line)
+    return out.getvalue()
+
+
+def schema_from_dump(path: Path):
+    model = SchemaModel()
+    model.apply_sql(dump_ddl(path), path.name)
+    return model
+
+
+# -- diff ------------------------------------------------------------------------
+
+def diff_schemas(expected: SchemaModel, actual: SchemaModel, schemas=None):
+    # Differences between the schema the migrations build (`expected`) and
+    # the one found in the dump (`actual`), restricted to `schemas` (default:
+    # the schemas the migrations create tables in).
+    if schemas is None:
+        schemas = {split_name(t)[0] for t in expected.tables}
+
+    def in_scope(name):
+        return split_name(name)[0] in schemas
+
+    exp_tables = {t for t in expected.tables if in_scope(t)}
+    act_tables = {t for t in actual.tables if in_scope(t)}
+    report = {
+        'missing_tables': sorted(exp_tables - act_tables),
+        'extra_tables': sorted(act_tables - exp_tables),
+        'missing_columns': [],
+        'extra_columns': [],
+        'mismatched_columns': [],
+        'missing_constraints': [],
+        'extra_constraints': [],
+        'mismatched_constraints': [],
+        'missing_indexes': [],
+        'extra_indexes': [],
+        'mismatched_indexes': [],
+        'missing_views': sorted(v for v in expected.views if in_scope(v) and v not in actual.views),
+        'extra_views': sorted(v for v in actual.views if in_scope(v) and v not in expected.views),
+    }
+    for table in sorted(exp_tables & act_tables):
+        exp, act = expected.tables[table], actual.tables[table]
+        for column, spec in exp['columns'].items():
+            other = act['columns'].get(column)
+            if other is None:
+                report['missing_columns'].append({'table': table, 'column': column, 'type': spec['type']})
+                continue
+            for field in ('type', 'not_null'):
+                if spec[field] != other[field]:
+                    report['mismatched_columns'].append({
+                        'table': table, 'column': column, 'field': field,
+                        'expected': spec[field], 'actual': other[field],
+                    })
+            if (spec['default'] is None) != (other['default'] is None):
+                report['mismatched_columns'].append({
+                    'table': table, 'column': column, 'field': 'default',
+                    'expected': spec['default'], 'actual': other['default'],
+                })
+        for column, spec in act['columns'].items():
+            if column not in exp['columns']:
+                report['extra_columns'].append({'table': table, 'column': column, 'type': spec['type']})
+        diff_named(report, 'constraints', table, exp['constraints'], act['constraints'], ('type', 'columns'))
+    exp_indexes = {k: v for k, v in expected.indexes.items() if in_scope(v['table']) and v['table'] in act_tables}
+    act_indexes = {k: v for k, v in actual.indexes.items() if in_scope(v['table']) and v['table'] in exp_tables}
+    diff_named(report, 'indexes', None, exp_indexes, act_indexes, ('table', 'columns', 'unique', 'partial'))
+    return report
+
+
+def diff_named(report, kind, table, expected, actual, fields):
+    for name in sorted(expected.keys() - actual.keys()):
+        report[f'missing_{kind}'].append({'table': table or expected[name]['table'], 'name': name, **expected[name]})
+    for name in sorted(actual.keys() - expected.keys()):
+        report[f'extra_{kind}'].append({'table': table or actual[name]['table'], 'name': name, **actual[name]})
+    for name in sorted(expected.keys() & actual.keys()):
+        for field in fields:
+            if expected[name][field] != actual[name][field]:
+                report[f'mismatched_{kind}'].append({
+                    'table': table or expected[name]['table'], 'name': name, 'field': field,
+                    'expected': expected[name][field], 'actual': actual[name][field],
+                })
+
+
+def has_drift(report) -> bool:
+    return any(report.values())
@@ -0,0 +1,345 @@
+import re
+from bisect import bisect_right
+
+# SQL statement extraction for the table read/write analysis. SQL is taken
+# from .sql files as a whole and from the string and template literals of
+# TS/JS sources that start with a SQL verb; `${...}` interpolations become
+# a "?" parameter. Each statement is tokenized once and walked left to right,
+# recording every table it reads (FROM/USING), joins, inserts into, updates
+# or deletes from, with the line it sits on. CTE names are not tables, and
+# FROM inside function calls (EXTRACT(... FROM x)) is not a table either.
+
+SQL_TOKEN_RE = re.compile(
+    r"""
+    (?P<ws>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$)
+    |(?P<qident>"(?:[^"]|"")*")
+    |(?P<param>\$\d+|\?|(?<!:):[A-Za-z_]\w*)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+    |(?P<ident>[A-Za-z_][\w$]*)
+    |(?P<op>::|<>|!=|<=|>=|\|\||.)
+    """,
+    re.S | re.X,
+)
+
+JS_START_RE = re.compile(r"//|/\*|['\"`]")
+JS_STRING_RE = {
+    "'": re.compile(r"'((?:[^'\\\n]|\\.)*)'", re.S),
+    '"': re.compile(r'"((?:[^"\\\n]|\\.)*)"', re.S),
+}
+JS_ESCAPE_RE = re.compile(r'\\(.)')
+SQL_START_RE = re.compile(
+    r'\s*(?:SELECT\s.*?\bFROM\s|INSERT\s+INTO\s|UPDATE\s+\S+\s+SET\s|DELETE\s+FROM\s'
+    r'|WITH\s+(?:RECURSIVE\s+)?\S+\s.*?\bAS\s*\(|MERGE\s+INTO\s|TRUNCATE\s)',
+    re.I | re.S,
+)
+
+WRITE_KINDS = ('insert', 'update', 'delete')
+READ_KINDS = ('read', 'join')
+
+# Keywords that can never be a table name where one is expected, and the
+# clause keywords that close a FROM/USING list.
+RESERVED = {
+    'ALL', 'AND', 'AS', 'BY', 'CASE', 'CROSS', 'DEFAULT', 'DISTINCT', 'DO', 'ELSE', 'END', 'EXCEPT',
+    'EXISTS', 'FETCH', 'FOR', 'FROM', 'FULL', 'GROUP', 'HAVING', 'IN', 'INNER', 'INTERSECT', 'INTO',
+    'IS', 'JOIN', 'LEFT', 'LIMIT', 'NATURAL', 'NOT', 'NULL', 'OFFSET', 'ON', 'OR', 'ORDER', 'OUTER',
+    'RETURNING', 'RIGHT', 'SELECT', 'SET', 'THEN', 'UNION', 'USING', 'VALUES', 'WHEN', 'WHERE',
+    'WINDOW', 'WITH',
+}
+SKIPPED_BEFORE_TABLE = {'ONLY', 'LATERAL', 'TABLE', 'IF', 'EXISTS'}
+NOT_TABLE_UPDATE = {'FOR', 'DO', 'ON', 'KEY'}
+QUERY_STARTS = {'SELECT', 'WITH', 'VALUES', 'INSERT', 'UPDATE', 'DELETE'}
+
+
+def tokenize_sql(sql: str):
+    # [(kind, text, offset)] without whitespace and comments.
+    tokens = []
+    for m in SQL_TOKEN_RE.finditer(sql):
+        kind = m.lastgroup
+        if kind == 'tag':
+            kind = 'dollar'
+        if kind in ('ws', 'comment'):
+            continue
+        tokens.append((kind, m.group(kind), m.start()))
+    return tokens
+
+
+def split_statements(tokens):
+    statements = []
+    current = []
+    for token in tokens:
+        if token[0] == 'op' and token[1] == ';':
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        statements.append(current)
+    return statements
+
+
+def normalize_table_name(name: str) -> str:
+    # schema.table as PostgreSQL resolves it: unquoted parts fold to lower
+    # case, quotes are dropped, and an unqualified name means public.
+    parts = []
+    for part in re.findall(r'"(?:[^"]|"")*"|[^.]+', name):
+        if part.startswith('"'):
+            parts.append(part[1:-1].replace('""', '"'))
+        else:
+            parts.append(part.strip().lower())
+    if len(parts) == 1:
+        parts.insert(0, 'public')
+    return '.'.join(parts[-2:])
+
+
+def keyword(token):
+    return token[1].upper() if token[0] == 'ident' else None
+
+
+def read_name(tokens, i):
+    # Qualified name starting at tokens[i]: (name, next index) or (None, i).
+    parts = []
+    while i < len(tokens) and tokens[i][0] in ('ident', 'qident'):
+        parts.append(tokens[i][1])
+        if i + 2 < len(tokens) and tokens[i + 1][1] == '.' and tokens[i + 2][0] in ('ident', 'qident'):
+            i += 2
+            continue
+        i += 1
+        break
+    return ('.'.join(parts), i) if parts else (None, i)
+
+
+def cte_names(tokens):
+    # Names defined by WITH [RECURSIVE] name [(cols)] AS [[NOT] MATERIALIZED] (...).
+    names = set()
+    for i, token in enumerate(tokens):
+        if token[0] not in ('ident', 'qident') or i == 0:
+            continue
+        prev = tokens[i - 1]
+        if not (keyword(prev) in ('WITH', 'RECURSIVE') or prev[1] == ','):
+            continue
+        j = i + 1
+        if j < len(tokens) and tokens[j][1] == '(':
+            depth = 0
+            while j < len(tokens):
+                depth += {'(': 1, ')': -1}.get(tokens[j][1], 0) if tokens[j][0] == 'op' else 0
+                j += 1
+                if depth == 0:
+                    break
+        if j + 1 < len(tokens) and keyword(tokens[j]) == 'AS':
+            k = j + 1
+            while k < len(tokens) and keyword(tokens[k]) in ('NOT', 'MATERIALIZED'):
+                k += 1
+            if k < len(tokens) and tokens[k][1] == '(':
+                names.add(normalize_table_name(token[1]))
+    return names
+
+
+def statement_refs(tokens):
+    # [(table, kind, offset)] for one tokenized statement.
+    ctes = cte_names(tokens)
+    refs = []
+    contexts = []          # per open paren: True when it holds a subquery
+    expect = None          # kind of table reference expected next
+    list_depth = None      # paren depth of an open FROM/USING list
+    outer_lists = []       # per open paren: list_depth outside it
+    last_kw = None
+    last_verb = None       # DELETE/MERGE enable a USING table list
+    i = 0
+    n = len(tokens)
+    while i < n:
+        kind, text, offset = tokens[i]
+        kw = keyword(tokens[i])
+        in_query = not contexts or contexts[-1]
+        if kind == 'op' and text == '(':
+            nxt = keyword(tokens[i + 1]) if i + 1 < n else None
+            contexts.append(nxt in QUERY_STARTS)
+            outer_lists.append(list_depth)
+            expect = None
+            i += 1
+            continue
+        if kind == 'op' and text == ')':
+            # A subquery in a FROM list leaves the outer list open:
+            # "FROM (SELECT ...) sub, b" still lists b
+            if contexts:
+                contexts.pop()
+                list_depth = outer_lists.pop()
+            elif list_depth is not None and len(contexts) < list_depth:
+                list_depth = None
+            expect = None
+            i += 1
+            continue
+        if kind == 'op' and text == ',':
+            if list_depth == len(contexts):
+                expect = 'read'
+            i += 1
+            continue
+        if expect and kw in SKIPPED_BEFORE_TABLE:
+            i += 1
+            continue
+        if expect and kind in ('ident', 'qident') and kw not in RESERVED:
+            name, j = read_name(tokens, i)
+            is_call = j < n and tokens[j][1] == '(' and expect in READ_KINDS
+            table = normalize_table_name(name)
+            if not is_call and table not in ctes:
+                refs.append((table, expect, offset))
+            expect = None
+            i = j
+            continue
+        expect = None
+        if kw is None:
+            i += 1
+            continue
+        if kw == 'FROM' and in_query:
+            expect = 'delete' if last_kw == 'DELETE' else 'read'
+            list_depth = len(contexts) if expect == 'read' else None
+        elif kw == 'USING' and last_verb in ('DELETE', 'MERGE') and i + 1 < n and tokens[i + 1][1] != '(':
+            expect = 'read'
+            list_depth = len(contexts)
+        elif kw == 'JOIN':
+            expect = 'join'
+            list_depth = None
+        elif kw == 'INTO' and last_kw in ('INSERT', 'MERGE'):
+            expect = 'insert' if last_kw == 'INSERT' else 'update'
+        elif kw == 'UPDATE' and last_kw not in NOT_TABLE_UPDATE:
+            expect = 'update'
+        elif kw == 'TRUNCATE':
+            expect = 'delete'
+        elif kw in RESERVED and list_depth == len(contexts) and kw not in ('AS', 'ON'):
+            list_depth = None
+        if kw in QUERY_STARTS or kw == 'MERGE':
+            last_verb = kw
+        last_kw = kw
+        i += 1
+    return refs
+
+
+def iter_js_strings(text: str, start: int = 0, end: int = None):
+    # (offset, content) of every string and template literal in JS/TS code,
+    # nested templates included; comments are skipped.
+    end = len(text) if end is None else end
+    pos = start
+    while pos < end:
+        m = JS_START_RE.search(text, pos, end)
+        if not m:
+            return
+        tok = m.group()
+        if tok == '//':
+            nl = text.find('\n', m.end(), end)
+            pos = end if nl < 0 else nl + 1
+        elif tok == '/*':
+            close = text.find('*/', m.end(), end)
+            pos = end if close < 0 else close + 2
+        elif tok == '`':
+            content, pos, nested = read_template(text, m.end(), end)
+            yield m.start(), content
+            yield from nested
+        else:
+            sm = JS_STRING_RE[tok].match(text, m.start(), end)
+            if not sm:
+                pos = m.end()
+                continue
+            yield m.start(), JS_ESCAPE_RE.sub(js_unescape, sm.group(1))
+            pos = sm.end()
+
+
+def js_unescape(m):
+    c = m.group(1)
+    return ' ' if c in 'nrt' else c
+
+
+def read_template(text: str, pos: int, end: int):
+    # Template literal body starting after the backtick: (content with each
+    # ${...} replaced by "?" and its newlines kept, position after the
+    # closing backtick, literals nested in the interpolations).
+    out = []
+    nested = []
+    chunk_start = pos
+    while pos < end:
+        c = text[pos]
+        if c == '\\':
+            pos += 2
+        elif c == '`':
+            out.append(text[chunk_start:pos])
+            return JS_ESCAPE_RE.sub(js_unescape, ''.join(out)), pos + 1, nested
+        elif c == '$' and text.startswith('${', pos):
+            out.append(text[chunk_start:pos])
+            expr_end = skip_interpolation(text, pos + 2, end)
+            nested.extend(iter_js_strings(text, pos + 2, max(pos + 2, expr_end - 1)))
+            out.append('?' + '\n' * text.count('\n', pos, expr_end))
+            pos = chunk_start = expr_end
+        else:
+            pos += 1
+    out.append(text[chunk_start:end])
+    return JS_ESCAPE_RE.sub(js_unescape, ''.join(out)), end, nested
+
+
+def skip_interpolation(text: str, pos: int, end: int) -> int:
+    # Position just past the "}" closing a ${ opened before `pos`.
+    depth = 1
+    while pos < end:
+        c = text[pos]
+        if c in '\'"':
+            sm = JS_STRING_RE[c].match(text, pos, end)
+            pos = sm.end() if sm else pos + 1
+        elif c == '`':
+            _, pos, _ = read_template(text, pos + 1, end)
+        elif c == '{':
+            depth += 1
+            pos += 1
+        elif c == '}':
+            depth -= 1
+            pos += 1
+            if depth == 0:
+                return pos
+        else:
+            pos += 1
+    return end
+
+
+def iter_sql_sources(text: str, suffix: str):
+    # (offset, sql) for the SQL held in a source file.
+    if suffix == '.sql':
+        yield 0, text
+        return
+    for offset, content in iter_js_strings(text):
+        if SQL_START_RE.match(content):
+            yield offset, content
+
+
+def iter_statement_tokens(text: str, suffix: str):
+    # (line, tokens, line_of) for every SQL statement in a source file;
+    # line_of maps a token offset to its line in the file. Literal bodies
+    # keep their newlines (escapes and interpolations do not add any), so
+    # lines are counted inside the SQL from the literal's line.
+    newlines = [m.start() for m in re.finditer('\n', text)]
+    for base, sql in iter_sql_sources(text, suffix):
+        base_line = bisect_right(newlines, base) + 1
+        sql_newlines = [m.start() for m in re.finditer('\n', sql)]
+
+        def line_of(offset, base_line=base_line, sql_newlines=sql_newlines):
+            return base_line + bisect_right(sql_newlines, offset)
+
+        for tokens in split_statements(tokenize_sql(sql)):
+            yield line_of(tokens[0][2]), tokens, line_of
+
+
+def extract_statements(text: str, suffix: str):
+    # [(line, verb, [(table, kind, line), ...])] for every SQL statement in
+    # a source file; kind is one of read, join, insert, update, delete.
+    return [
+        (line, tokens[0][1].upper(), [(table, kind, line_of(offset)) for table, kind, offset in statement_refs(tokens)])
+        for line, tokens, line_of in iter_statement_tokens(text, suffix)
+    ]
+
+
+def extract_table_refs(text: str, suffix: str):
+    # Flat [(line, table, kind)] over all statements of a source file.
+    return [
+        (line, table, kind)
+        for _, _, refs in extract_statements(text, suffix)
+        for table, kind, line in refs
+    ]
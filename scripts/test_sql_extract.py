@@ -0,0 +1,41 @@
+import unittest
+
+from sql_extract import extract_table_refs
+
+# Table references of FROM lists around subqueries. Run from this directory:
+#   python -m unittest test_sql_extract
+
+
+def refs(sql):
+    return [(table, kind) for _, table, kind in extract_table_refs(sql, '.sql')]
+
+
+class StatementRefsTest(unittest.TestCase):
+
+    def test_from_list_continues_after_subquery(self):
+        self.assertEqual(
+            refs('SELECT * FROM (SELECT * FROM a) sub, b'),
+            [('public.a', 'read'), ('public.b', 'read')],
+        )
+
+    def test_join_after_subquery(self):
+        self.assertEqual(
+            refs('SELECT * FROM (SELECT * FROM a) sub JOIN b ON b.id = sub.id'),
+            [('public.a', 'read'), ('public.b', 'join')],
+        )
+
+    def test_nested_subqueries_in_from_list(self):
+        self.assertEqual(
+            refs('SELECT * FROM a, (SELECT * FROM b WHERE x IN (SELECT y FROM c)) s, d WHERE e = 1'),
+            [('public.a', 'read'), ('public.b', 'read'), ('public.c', 'read'), ('public.d', 'read')],
+        )
+
+    def test_closed_from_list_stays_closed(self):
+        self.assertEqual(
+            refs('SELECT * FROM a WHERE x IN (SELECT y FROM b), c'),
+            [('public.a', 'read'), ('public.b', 'read')],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
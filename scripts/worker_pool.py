@@ -0,0 +1,19 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Process pool helper shared by the scanners. Pools use the platform's
+# default start method (spawn on macOS and Windows), so `fn` and the
+# initializer must live in an importable module and the scripts that reach
+# a pool keep their work under main().
+
+
+def map_tasks(fn, tasks, workers=None, initializer=None, initargs=()):
+    # list(map(fn, tasks)) over a process pool of `workers` (default: one per
+    # core), results in task order. Runs inline for a single worker or task.
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        if initializer:
+            initializer(*initargs)
+        return list(map(fn, tasks))
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(fn, tasks, chunksize=max(1, len(tasks) // (workers * 4))))